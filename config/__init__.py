@@ -2,8 +2,8 @@
 Configuration management for Sidekick.
 """
 
-from .settings import SidekickConfig, load_config, save_config
+from .settings import SidekickConfig, load_config, reload_config, save_config
 from .paths import get_models_path, get_output_path, get_temp_path
 
-__all__ = ["SidekickConfig", "load_config", "save_config", 
+__all__ = ["SidekickConfig", "load_config", "reload_config", "save_config", 
            "get_models_path", "get_output_path", "get_temp_path"]
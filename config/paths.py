@@ -2,15 +2,38 @@
 Path management utilities for Sidekick.
 """
 
+import contextlib
 import os
-from typing import Optional
+import threading
+from typing import Iterator, Optional
 from .settings import load_config
 
+# Directories already created by this process
+_ensured_directories = set()
+_directories_lock = threading.Lock()
+
+# Next free numeric suffix per (directory, name, extension)
+_filename_counters = {}
+_filenames_lock = threading.Lock()
+
 def ensure_directory(path: str) -> str:
-    """Ensure directory exists and return the path."""
+    """Ensure directory exists and return the path.
+    
+    Each path is created at most once per process; call
+    ``clear_directory_cache`` if directories may be removed externally.
+    """
+    if path in _ensured_directories:
+        return path
     os.makedirs(path, exist_ok=True)
+    with _directories_lock:
+        _ensured_directories.add(path)
     return path
 
+def clear_directory_cache() -> None:
+    """Forget which directories were ensured so they are re-created on use."""
+    with _directories_lock:
+        _ensured_directories.clear()
+
 def get_models_path() -> str:
     """Get the models directory path."""
     config = load_config()
@@ -46,21 +69,78 @@ def get_safe_filename(filename: str) -> str:
     
     return safe_filename.strip('_')
 
+def _seed_filename_counter(base_path: str, safe_name: str, extension: str) -> int:
+    """Find the next free suffix for a name with a single directory scan."""
+    prefix = safe_name + '_'
+    next_index = 0
+    try:
+        with os.scandir(base_path) as entries:
+            for entry in entries:
+                name = entry.name
+                if not name.endswith(extension):
+                    continue
+                stem = name[:len(name) - len(extension)] if extension else name
+                if stem == safe_name:
+                    next_index = max(next_index, 1)
+                elif stem.startswith(prefix) and stem[len(prefix):].isdigit():
+                    next_index = max(next_index, int(stem[len(prefix):]) + 1)
+    except FileNotFoundError:
+        pass
+    return next_index
+
 def get_unique_filename(base_path: str, filename: str, extension: str = "") -> str:
-    """Get a unique filename by adding numbers if file exists."""
+    """Get a unique filename by adding numbers if file exists.
+    
+    The next free number is tracked per directory and name (seeded by one
+    directory scan), so repeated calls in this process return distinct
+    paths without rescanning. Nothing is created on disk, so another
+    process may still take the path before it is written; use
+    ``reserve_unique_filename`` to claim it atomically.
+    """
     if not extension.startswith('.') and extension:
         extension = '.' + extension
     
     safe_name = get_safe_filename(filename)
-    full_path = os.path.join(base_path, safe_name + extension)
+    key = (os.path.abspath(base_path), safe_name, extension)
     
-    if not os.path.exists(full_path):
-        return full_path
+    with _filenames_lock:
+        index = _filename_counters.get(key)
+        if index is None:
+            index = _seed_filename_counter(base_path, safe_name, extension)
+        
+        while True:
+            name = f"{safe_name}_{index}{extension}" if index else safe_name + extension
+            full_path = os.path.join(base_path, name)
+            index += 1
+            if not os.path.exists(full_path):
+                _filename_counters[key] = index
+                return full_path
+
+@contextlib.contextmanager
+def reserve_unique_filename(base_path: str, filename: str, extension: str = "") -> Iterator[str]:
+    """Claim a unique path from ``get_unique_filename`` for the ``with`` block.
     
-    counter = 1
+    The path is reserved by creating it atomically with
+    ``O_CREAT | O_EXCL``, so concurrent threads or processes never receive
+    the same path; the block overwrites the empty placeholder. If the block
+    raises, the file is removed, so a failed save leaves neither a
+    placeholder nor a partial file behind.
+    """
     while True:
-        new_name = f"{safe_name}_{counter}{extension}"
-        full_path = os.path.join(base_path, new_name)
-        if not os.path.exists(full_path):
-            return full_path
-        counter += 1
+        path = get_unique_filename(base_path, filename, extension)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            # Taken by another process since it was checked
+            continue
+        os.close(fd)
+        break
+    
+    try:
+        yield path
+    except BaseException:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
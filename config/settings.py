@@ -4,6 +4,8 @@ Configuration settings for Sidekick.
 
 import json
 import os
+import threading
+import time
 from typing import Dict, Any, Optional
 from dataclasses import dataclass, asdict
 
@@ -31,16 +33,26 @@ class SidekickConfig:
     default_height: int = 512
     default_steps: int = 20
     default_cfg_scale: float = 7.5
+    generation_batch_window_ms: int = 0
+    generation_max_batch_size: int = 8
     
     # Video settings
     default_fps: int = 30
     default_duration: float = 2.0
     
     # Processing settings
-    max_image_size: int = 2048
+    max_image_size: int = 2048  # Soft limit: larger images are processed in tiles
     enable_gpu: bool = True
     gpu_memory_fraction: float = 0.8
     
+    # Cache settings
+    cache_max_memory_mb: int = 1024
+    cache_disk_enabled: bool = False
+    cache_max_disk_mb: int = 4096
+    lora_merge_cache_mb: int = 2048
+    lora_fused_cache_mb: int = 256
+    prompt_cache_max_mb: int = 256
+    
     # UI settings
     show_advanced_options: bool = False
     auto_save_outputs: bool = True
@@ -58,10 +70,23 @@ def get_config_path() -> str:
     """Get the path to the configuration file."""
     return os.path.join(os.path.dirname(__file__), "..", "sidekick_config.json")
 
-def load_config() -> SidekickConfig:
-    """Load configuration from file."""
-    config_path = get_config_path()
-    
+# Seconds between checks of the config file for changes
+CONFIG_CHECK_INTERVAL = 1.0
+
+_config_lock = threading.Lock()
+_config: Optional[SidekickConfig] = None
+_config_signature = None
+_config_checked_at = 0.0
+
+def _file_signature(path: str) -> Optional[tuple]:
+    """Identify a file version by inode, size and modification time."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def _read_config(config_path: str) -> SidekickConfig:
     if os.path.exists(config_path):
         try:
             with open(config_path, 'r') as f:
@@ -72,8 +97,40 @@ def load_config() -> SidekickConfig:
     
     return SidekickConfig()
 
+def load_config() -> SidekickConfig:
+    """Load configuration, reusing the cached copy while the file is unchanged.
+    
+    The file is checked at most every ``CONFIG_CHECK_INTERVAL`` seconds and
+    re-parsed only when its inode, size or mtime changed. The returned
+    config is shared, so treat it as read-only and persist changes with
+    ``save_config``.
+    """
+    global _config, _config_signature, _config_checked_at
+    
+    now = time.monotonic()
+    config = _config
+    if config is not None and now - _config_checked_at < CONFIG_CHECK_INTERVAL:
+        return config
+    
+    with _config_lock:
+        config_path = get_config_path()
+        signature = _file_signature(config_path)
+        if _config is None or signature != _config_signature:
+            _config = _read_config(config_path)
+            _config_signature = signature
+        _config_checked_at = now
+        return _config
+
+def reload_config() -> SidekickConfig:
+    """Force the configuration to be re-read from file."""
+    global _config
+    with _config_lock:
+        _config = None
+    return load_config()
+
 def save_config(config: SidekickConfig) -> bool:
-    """Save configuration to file."""
+    """Save configuration to file and make it the cached configuration."""
+    global _config, _config_signature, _config_checked_at
     config_path = get_config_path()
     
     try:
@@ -82,7 +139,12 @@ def save_config(config: SidekickConfig) -> bool:
         
         with open(config_path, 'w') as f:
             json.dump(config.to_dict(), f, indent=2)
-        return True
     except Exception as e:
         print(f"Error saving config: {e}")
         return False
+    
+    with _config_lock:
+        _config = config
+        _config_signature = _file_signature(config_path)
+        _config_checked_at = time.monotonic()
+    return True
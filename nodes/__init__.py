@@ -1,13 +1,11 @@
 """
 Node registry and imports for all Sidekick nodes.
+
+Nodes are registered from the static manifest in ``registry`` as lazy
+proxies, so importing Sidekick does not import torch or any node module.
 """
 
-from .base import SidekickBaseNode
-from .lora_training import *
-from .image_generation import *
-from .line_art_processing import *
-from .comparison import *
-from .video_output import *
+from .registry import NODE_MANIFEST, lazy_node, lazy_exports
 
 # Node class mappings for ComfyUI
 NODE_CLASS_MAPPINGS = {}
@@ -19,19 +17,15 @@ def register_node(cls, display_name=None):
     NODE_DISPLAY_NAME_MAPPINGS[cls.__name__] = display_name or cls.__name__
     return cls
 
-# Auto-register all nodes that inherit from SidekickBaseNode
-def _auto_register_nodes():
-    """Automatically register all node classes."""
-    import inspect
-    import sys
-    
-    current_module = sys.modules[__name__]
-    
-    for name, obj in inspect.getmembers(current_module):
-        if (inspect.isclass(obj) and 
-            issubclass(obj, SidekickBaseNode) and 
-            obj != SidekickBaseNode and
-            hasattr(obj, 'CATEGORY')):
-            register_node(obj, getattr(obj, 'DISPLAY_NAME', name))
+def _register_manifest_nodes():
+    """Register a lazy proxy for every node in the manifest."""
+    for spec in NODE_MANIFEST:
+        register_node(lazy_node(spec), spec.display_name)
+
+_register_manifest_nodes()
 
-_auto_register_nodes()
+# Real node classes and base classes are imported on attribute access
+__getattr__ = lazy_exports(__name__, {
+    "SidekickBaseNode": ".base",
+    **{spec.class_name: spec.module for spec in NODE_MANIFEST},
+})
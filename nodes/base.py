@@ -2,10 +2,14 @@
 Base classes and utilities for Sidekick nodes.
 """
 
+import functools
+import inspect
 import torch
 import numpy as np
-from typing import Dict, Any, Tuple, Optional, List, Union
+from typing import Dict, Any, Tuple, Optional, List, Union, Iterable
 from abc import ABC, abstractmethod
+from ..utils.image_utils import to_bhwc, tensor_to_numpy_uint8, numpy_uint8_to_tensor
+from ..utils.cache import fingerprint, get_node_cache
 
 class SidekickBaseNode(ABC):
     """Base class for all Sidekick nodes."""
@@ -15,6 +19,16 @@ class SidekickBaseNode(ABC):
     RETURN_NAMES = ()
     FUNCTION = "execute"
     
+    # Deterministic nodes always produce the same outputs for the same
+    # inputs, so their results are cached by input fingerprint. Cached
+    # outputs are shared between runs and must not be modified in place
+    DETERMINISTIC = False
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.DETERMINISTIC and "execute" in cls.__dict__:
+            cls.execute = _cached_execute(cls.execute)
+    
     @classmethod
     @abstractmethod
     def INPUT_TYPES(cls) -> Dict[str, Any]:
@@ -27,84 +41,78 @@ class SidekickBaseNode(ABC):
         pass
     
     @classmethod
-    def IS_CHANGED(cls, **kwargs) -> float:
+    def IS_CHANGED(cls, **kwargs):
         """Determine if node output should be recalculated."""
+        if cls.DETERMINISTIC:
+            # Unchanged inputs give an unchanged fingerprint
+            return fingerprint(kwargs)
         return float("nan")  # Always recalculate by default
 
+def _cached_execute(execute):
+    """Wrap a deterministic node's execute with the shared result cache."""
+    signature = inspect.signature(execute)
+    
+    @functools.wraps(execute)
+    def wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        inputs = dict(bound.arguments)
+        inputs.pop("self")
+        
+        cache = get_node_cache()
+        key = fingerprint((type(self).__qualname__, inputs))
+        result = cache.get(key)
+        hit = result is not None
+        if not hit:
+            result = execute(self, *args, **kwargs)
+            cache.put(key, result)
+        return _with_cache_report(type(self), result, hit, cache.stats())
+    
+    return wrapper
+
+def _with_cache_report(node_class, result, hit: bool, stats: Dict[str, Any]):
+    """Append the cache outcome to a node's first STRING output (its report)."""
+    if not isinstance(result, tuple) or "STRING" not in node_class.RETURN_TYPES:
+        return result
+    index = node_class.RETURN_TYPES.index("STRING")
+    if index >= len(result) or not isinstance(result[index], str):
+        return result
+    line = (f"- Node Cache: {'hit' if hit else 'miss'} ({stats['hit_rate']:.0%} hit rate, "
+            f"{stats['entries']} entries, {stats['bytes'] / (1024 * 1024):.1f} MB)\n")
+    return result[:index] + (result[index] + line,) + result[index + 1:]
+
 class SidekickImageNode(SidekickBaseNode):
     """Base class for image processing nodes."""
     
     @staticmethod
     def tensor_to_pil(tensor: torch.Tensor):
-        """Convert tensor to PIL Image."""
+        """Convert the first image of a tensor to a PIL Image."""
         from PIL import Image
         
-        # Handle different tensor formats
-        if len(tensor.shape) == 4:  # Batch dimension
-            tensor = tensor.squeeze(0)
-        
-        if tensor.shape[0] == 3:  # CHW format
-            tensor = tensor.permute(1, 2, 0)
-        
-        # Convert to numpy and scale to 0-255
-        np_image = (tensor.cpu().numpy() * 255).astype(np.uint8)
+        np_image = tensor_to_numpy_uint8(to_bhwc(tensor)[:1])[0]
+        if np_image.shape[-1] == 1:
+            np_image = np_image[..., 0]
         return Image.fromarray(np_image)
     
     @staticmethod
     def pil_to_tensor(image) -> torch.Tensor:
-        """Convert PIL Image to tensor."""
-        import torchvision.transforms as transforms
-        
-        transform = transforms.Compose([
-            transforms.ToTensor()
-        ])
-        
-        tensor = transform(image)
-        return tensor.unsqueeze(0)  # Add batch dimension
+        """Convert PIL Image to a BCHW tensor."""
+        return numpy_uint8_to_tensor(np.asarray(image), layout="BCHW").contiguous()
 
 class SidekickVideoNode(SidekickBaseNode):
     """Base class for video processing nodes."""
     
     @staticmethod
-    def frames_to_video(frames: List[torch.Tensor], fps: int = 30, output_path: str = None):
-        """Convert list of frame tensors to video."""
-        import cv2
-        import tempfile
-        import os
-        
-        if output_path is None:
-            output_path = tempfile.mktemp(suffix='.mp4')
-        
-        if not frames:
-            raise ValueError("No frames provided")
-        
-        # Get dimensions from first frame
-        first_frame = frames[0]
-        if len(first_frame.shape) == 4:
-            first_frame = first_frame.squeeze(0)
-        
-        height, width = first_frame.shape[-2:]
-        
-        # Initialize video writer
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-        
-        try:
-            for frame_tensor in frames:
-                # Convert tensor to numpy array
-                if len(frame_tensor.shape) == 4:
-                    frame_tensor = frame_tensor.squeeze(0)
-                
-                if frame_tensor.shape[0] == 3:  # CHW to HWC
-                    frame_tensor = frame_tensor.permute(1, 2, 0)
-                
-                frame_np = (frame_tensor.cpu().numpy() * 255).astype(np.uint8)
-                
-                # Convert RGB to BGR for OpenCV
-                frame_bgr = cv2.cvtColor(frame_np, cv2.COLOR_RGB2BGR)
-                out.write(frame_bgr)
-        
-        finally:
-            out.release()
+    def frames_to_video(frames: Iterable[torch.Tensor], fps: int = 30, output_path: str = None,
+                        codec: str = "mp4v", queue_size: int = 8) -> str:
+        """Encode frame tensors to a video file.
         
-        return output_path
+        Frames may be any iterable (list, generator or lazy frame source);
+        they are consumed one at a time and encoded on a background thread.
+        """
+        # Imported here so only video nodes pay for OpenCV
+        from ..utils.video_utils import StreamingVideoEncoder
+        with StreamingVideoEncoder(output_path, fps=fps, codec=codec,
+                                   queue_size=queue_size) as encoder:
+            encoder.write_frames(frames)
+        return encoder.output_path
@@ -2,7 +2,13 @@
 Image comparison and analysis nodes.
 """
 
-from .ab_comparison import ABComparisonNode
-from .metrics import ImageMetricsNode
+from ..registry import lazy_exports
 
-__all__ = ["ABComparisonNode", "ImageMetricsNode"]
+# Node modules are imported when their class is first accessed
+__getattr__ = lazy_exports(__name__, {
+    "ABComparisonNode": ".ab_comparison",
+    "ImageMetricsNode": ".metrics",
+    "ComparisonMatrixNode": ".matrix",
+})
+
+__all__ = ["ABComparisonNode", "ImageMetricsNode", "ComparisonMatrixNode"]
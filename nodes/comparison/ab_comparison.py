@@ -4,8 +4,10 @@ A/B comparison node for image analysis.
 
 import torch
 import numpy as np
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Optional
 from ..base import SidekickImageNode
+from ...utils.image_utils import RESIZE_STRATEGIES, detect_layout, match_sizes, to_bchw
+from ...utils.metrics import compare_images, psnr_from_mse, ssim
 
 class ABComparisonNode(SidekickImageNode):
     """Node for A/B comparison of images with metrics and visualization."""
@@ -14,6 +16,7 @@ class ABComparisonNode(SidekickImageNode):
     DISPLAY_NAME = "A/B Image Comparison"
     RETURN_TYPES = ("IMAGE", "STRING", "FLOAT", "FLOAT")
     RETURN_NAMES = ("comparison_image", "analysis_report", "similarity_score", "quality_score")
+    DETERMINISTIC = True
     
     @classmethod
     def INPUT_TYPES(cls) -> Dict[str, Any]:
@@ -29,28 +32,23 @@ class ABComparisonNode(SidekickImageNode):
                 "show_metrics": ("BOOLEAN", {"default": True}),
                 "show_labels": ("BOOLEAN", {"default": True}),
                 "overlay_opacity": ("FLOAT", {"default": 0.5, "min": 0.0, "max": 1.0, "step": 0.1}),
+                "resize_strategy": (RESIZE_STRATEGIES, {"default": "smallest"}),
+                "max_resolution": ("INT", {"default": 0, "min": 0, "max": 8192, "step": 64}),
             }
         }
     
     def execute(self, image_a, image_b, comparison_type, label_a="Image A", 
                 label_b="Image B", show_metrics=True, show_labels=True, 
-                overlay_opacity=0.5) -> Tuple:
+                overlay_opacity=0.5, resize_strategy="smallest", max_resolution=0) -> Tuple:
         """Create A/B comparison visualization."""
         
-        # Ensure images are the same size
-        if image_a.shape != image_b.shape:
-            # Resize image_b to match image_a
-            target_height, target_width = image_a.shape[-2:]
-            image_b = torch.nn.functional.interpolate(
-                image_b, size=(target_height, target_width), 
-                mode='bilinear', align_corners=False
-            )
+        # Bring both images to a common size, downsampling the larger one
+        # by default (max_resolution of 0 means no cap)
+        image_a, image_b = match_sizes(image_a, image_b, resize_strategy, max_resolution)
         
-        # Calculate similarity metrics
-        similarity_score = self._calculate_similarity(image_a, image_b)
-        quality_score = self._calculate_quality_score(image_a, image_b)
-        
-        # Create comparison visualization
+        # Create comparison visualization; the fused grid also collects
+        # the pixel statistics used by the metrics
+        stats = None
         if comparison_type == "side_by_side":
             comparison_image = self._create_side_by_side(image_a, image_b)
         elif comparison_type == "overlay":
@@ -58,10 +56,16 @@ class ABComparisonNode(SidekickImageNode):
         elif comparison_type == "difference":
             comparison_image = self._create_difference(image_a, image_b)
         elif comparison_type == "grid":
-            comparison_image = self._create_grid(image_a, image_b)
+            comparison_image, stats = self._create_grid_fused(image_a, image_b)
         else:
             comparison_image = self._create_side_by_side(image_a, image_b)
         
+        # Calculate per-pair similarity metrics
+        scores = self._calculate_similarity(image_a, image_b, stats)
+        quality_scores = self._calculate_quality_score(image_a, image_b, stats)
+        similarity_score = scores["ssim"].mean().item()
+        quality_score = quality_scores.mean().item()
+        
         # Generate analysis report
         analysis_report = f"A/B Comparison Analysis:\n"
         analysis_report += f"- Comparison Type: {comparison_type}\n"
@@ -69,28 +73,43 @@ class ABComparisonNode(SidekickImageNode):
         analysis_report += f"- Image B: {label_b}\n"
         analysis_report += f"- Similarity Score: {similarity_score:.3f}\n"
         analysis_report += f"- Quality Score: {quality_score:.3f}\n"
-        analysis_report += f"- Image Dimensions: {image_a.shape[-2:]}px\n"
+        analysis_report += f"- PSNR: {scores['psnr'].mean().item():.2f} dB\n"
+        analysis_report += f"- Image Dimensions: {tuple(to_bchw(image_a).shape[-2:])}px\n"
+        if len(quality_scores) > 1:
+            analysis_report += f"Per pair:\n"
+            for i in range(len(quality_scores)):
+                analysis_report += (f"- Pair {i}: SSIM {scores['ssim'][i].item():.3f}, "
+                                    f"PSNR {scores['psnr'][i].item():.2f} dB, "
+                                    f"Quality {quality_scores[i].item():.3f}\n")
         
         return (comparison_image, analysis_report, similarity_score, quality_score)
     
-    def _calculate_similarity(self, img_a: torch.Tensor, img_b: torch.Tensor) -> float:
-        """Calculate structural similarity between images."""
-        # Simple MSE-based similarity (can be enhanced with SSIM later)
-        mse = torch.mean((img_a - img_b) ** 2)
-        similarity = 1.0 / (1.0 + mse.item())
-        return similarity
+    def _calculate_similarity(self, img_a: torch.Tensor, img_b: torch.Tensor,
+                              stats: Optional[Dict[str, torch.Tensor]] = None) -> Dict[str, torch.Tensor]:
+        """Calculate per-pair SSIM and PSNR between images."""
+        if stats is not None:
+            scores = {"ssim": ssim(img_a, img_b), "psnr": psnr_from_mse(stats["mse"])}
+        else:
+            scores = compare_images(img_a, img_b, metrics=("ssim", "psnr"))
+        return {name: values.cpu() for name, values in scores.items()}
     
-    def _calculate_quality_score(self, img_a: torch.Tensor, img_b: torch.Tensor) -> float:
-        """Calculate relative quality score."""
+    def _calculate_quality_score(self, img_a: torch.Tensor, img_b: torch.Tensor,
+                                 stats: Optional[Dict[str, torch.Tensor]] = None) -> torch.Tensor:
+        """Calculate per-pair relative quality score."""
         # Simple variance-based quality metric
-        var_a = torch.var(img_a)
-        var_b = torch.var(img_b)
-        quality_ratio = min(var_a, var_b) / max(var_a, var_b)
-        return quality_ratio.item()
+        if stats is not None:
+            var_a, var_b = stats["var_a"], stats["var_b"]
+        else:
+            var_a = torch.var(img_a.flatten(1).float(), dim=1)
+            var_b = torch.var(img_b.flatten(1).float(), dim=1)
+        quality_ratio = torch.minimum(var_a, var_b) / torch.maximum(var_a, var_b).clamp_min(1e-12)
+        return quality_ratio.cpu()
     
     def _create_side_by_side(self, img_a: torch.Tensor, img_b: torch.Tensor) -> torch.Tensor:
         """Create side-by-side comparison."""
-        return torch.cat([img_a, img_b], dim=-1)  # Concatenate along width
+        img_a, img_b = torch.broadcast_tensors(img_a, img_b)
+        width_dim = -2 if detect_layout(img_a) == "BHWC" else -1
+        return torch.cat([img_a, img_b], dim=width_dim)  # Concatenate along width
     
     def _create_overlay(self, img_a: torch.Tensor, img_b: torch.Tensor, opacity: float) -> torch.Tensor:
         """Create overlay comparison."""
@@ -105,12 +124,45 @@ class ABComparisonNode(SidekickImageNode):
     
     def _create_grid(self, img_a: torch.Tensor, img_b: torch.Tensor) -> torch.Tensor:
         """Create 2x2 grid with original and difference images."""
-        diff = self._create_difference(img_a, img_b)
-        overlay = self._create_overlay(img_a, img_b, 0.5)
+        return self._create_grid_fused(img_a, img_b)[0]
+    
+    def _create_grid_fused(self, img_a: torch.Tensor, img_b: torch.Tensor) -> Tuple[torch.Tensor, Dict[str, torch.Tensor]]:
+        """Render the 2x2 grid into one preallocated canvas and collect statistics.
+        
+        A, B, the difference map and the 50% overlay are written directly
+        into views of the output, so the only full-size allocation is the
+        canvas itself. The per-pair MSE and variances used by the metrics
+        are reduced from the same views without further temporaries.
+        Returns the canvas in the input layout.
+        """
+        channels_last = detect_layout(img_a) == "BHWC"
+        a, b = to_bchw(img_a), to_bchw(img_b)
+        batch = max(a.shape[0], b.shape[0])
+        a = a.expand(batch, *a.shape[1:])
+        b = b.expand(batch, *b.shape[1:])
+        _, channels, height, width = a.shape
+        
+        if channels_last:
+            canvas = torch.empty((batch, 2 * height, 2 * width, channels), dtype=a.dtype, device=a.device)
+        else:
+            canvas = torch.empty((batch, channels, 2 * height, 2 * width), dtype=a.dtype, device=a.device)
+        view = to_bchw(canvas)
+        top_left = view[..., :height, :width]
+        top_right = view[..., :height, width:]
+        bottom_left = view[..., height:, :width]
+        bottom_right = view[..., height:, width:]
+        
+        top_left.copy_(a)
+        top_right.copy_(b)
+        var_a = torch.var(top_left, dim=(1, 2, 3)).float()
+        var_b = torch.var(top_right, dim=(1, 2, 3)).float()
+        
+        # Difference: signed error first, reduced to MSE, then enhanced in place
+        torch.sub(a, b, out=bottom_left)
+        squared_norm = torch.linalg.vector_norm(bottom_left, dim=(1, 2, 3), dtype=torch.float32) ** 2
+        mse = squared_norm / (channels * height * width)
+        bottom_left.abs_().mul_(3.0).clamp_(0.0, 1.0)
         
-        # Create 2x2 grid
-        top_row = torch.cat([img_a, img_b], dim=-1)
-        bottom_row = torch.cat([diff, overlay], dim=-1)
-        grid = torch.cat([top_row, bottom_row], dim=-2)
+        torch.add(a, b, out=bottom_right).mul_(0.5)
         
-        return grid
+        return canvas, {"mse": mse, "var_a": var_a, "var_b": var_b}
@@ -0,0 +1,56 @@
+"""
+Image quality metrics node.
+"""
+
+from typing import Dict, Any, Tuple
+from ..base import SidekickImageNode
+from ...utils.image_utils import match_sizes
+from ...utils.metrics import compare_images
+
+class ImageMetricsNode(SidekickImageNode):
+    """Node for scoring image pairs with SSIM, MS-SSIM and PSNR."""
+    
+    CATEGORY = "sidekick/comparison"
+    DISPLAY_NAME = "Image Quality Metrics"
+    RETURN_TYPES = ("STRING", "FLOAT", "FLOAT", "FLOAT")
+    RETURN_NAMES = ("metrics_report", "ssim", "ms_ssim", "psnr")
+    DETERMINISTIC = True
+    
+    @classmethod
+    def INPUT_TYPES(cls) -> Dict[str, Any]:
+        return {
+            "required": {
+                "image_a": ("IMAGE",),
+                "image_b": ("IMAGE",),
+            },
+            "optional": {
+                "label_a": ("STRING", {"default": "Image A"}),
+                "label_b": ("STRING", {"default": "Image B"}),
+            }
+        }
+    
+    def execute(self, image_a, image_b, label_a="Image A", label_b="Image B") -> Tuple:
+        """Score every image pair and report the per-pair and mean metrics.
+        
+        A single reference image is compared against every image of the
+        other batch, and images of different sizes are compared at the
+        smaller size.
+        """
+        image_a, image_b = match_sizes(image_a, image_b)
+        scores = compare_images(image_a, image_b)
+        ssim = scores["ssim"].cpu()
+        ms_ssim = scores["ms_ssim"].cpu()
+        psnr = scores["psnr"].cpu()
+        
+        metrics_report = f"Image Quality Metrics ({label_a} vs {label_b}):\n"
+        metrics_report += f"- Pairs: {len(ssim)}\n"
+        metrics_report += f"- Mean SSIM: {ssim.mean().item():.4f}\n"
+        metrics_report += f"- Mean MS-SSIM: {ms_ssim.mean().item():.4f}\n"
+        metrics_report += f"- Mean PSNR: {psnr.mean().item():.2f} dB\n"
+        if len(ssim) > 1:
+            metrics_report += "Per pair:\n"
+            for i in range(len(ssim)):
+                metrics_report += (f"- Pair {i}: SSIM {ssim[i].item():.4f}, "
+                                   f"MS-SSIM {ms_ssim[i].item():.4f}, PSNR {psnr[i].item():.2f} dB\n")
+        
+        return (metrics_report, ssim.mean().item(), ms_ssim.mean().item(), psnr.mean().item())
@@ -2,7 +2,13 @@
 Image generation nodes for Sidekick.
 """
 
-from .generator import SidekickImageGeneratorNode
-from .style_transfer import StyleTransferNode
+from ..registry import lazy_exports
 
-__all__ = ["SidekickImageGeneratorNode", "StyleTransferNode"]
+# Node modules are imported when their class is first accessed
+__getattr__ = lazy_exports(__name__, {
+    "SidekickImageGeneratorNode": ".generator",
+    "StyleTransferNode": ".style_transfer",
+    "LoRAStackNode": ".lora_stack",
+})
+
+__all__ = ["SidekickImageGeneratorNode", "StyleTransferNode", "LoRAStackNode"]
@@ -0,0 +1,77 @@
+"""
+Cached text conditioning for image generation.
+
+Encoding a prompt is deterministic for a given text encoder and prompt,
+so each distinct pair is encoded once and kept in a byte-bounded LRU
+shared by every generator node. The generator's LoRAs only patch the
+diffusion model; a LoRA applied to the text encoder upstream produces a
+new ``CLIP`` object and therefore its own cache entries.
+"""
+
+import functools
+import math
+import threading
+import torch
+from typing import Any, List, Tuple
+from ...utils.cache import NodeResultCache, fingerprint, object_identity
+
+def encode_prompt(clip: Any, text: str) -> list:
+    """Encode a prompt with a ComfyUI ``CLIP`` into ``CONDITIONING``."""
+    tokens = clip.tokenize(text)
+    cond, pooled = clip.encode_from_tokens(tokens, return_pooled=True)
+    return [[cond, {"pooled_output": pooled}]]
+
+def batch_conditioning(conditionings: List[list]) -> list:
+    """Concatenate single-prompt ``CONDITIONING`` values along the batch.
+
+    Token counts are matched by repeating each prompt's embedding up to
+    their least common multiple, as ComfyUI does when batching conds, so
+    every row keeps its own prompt.
+    """
+    conds = [conditioning[0][0] for conditioning in conditionings]
+    length = functools.reduce(lambda a, b: a * b // math.gcd(a, b), (cond.shape[1] for cond in conds))
+    batched = torch.cat([cond.repeat(1, length // cond.shape[1], 1) for cond in conds])
+    pooled = [conditioning[0][1].get("pooled_output") for conditioning in conditionings]
+    extras = {"pooled_output": torch.cat(pooled)} if all(p is not None for p in pooled) else {}
+    return [[batched, extras]]
+
+class PromptEmbeddingCache:
+    """Prompt conditioning keyed by ``(encoder, prompt text)``.
+
+    Args:
+        max_bytes: Budget of cached conditioning tensors.
+    """
+
+    def __init__(self, max_bytes: int):
+        self._cache = NodeResultCache(max_bytes)
+
+    def encode(self, clip: Any, text: str) -> Tuple[list, bool]:
+        """Conditioning of ``text`` and whether it came from the cache."""
+        key = fingerprint((object_identity(clip), text))
+        conditioning = self._cache.get(key)
+        if conditioning is not None:
+            return conditioning, True
+        conditioning = encode_prompt(clip, text)
+        self._cache.put(key, conditioning)
+        return conditioning, False
+
+    def stats(self):
+        return self._cache.stats()
+
+    def summary(self) -> str:
+        stats = self.stats()
+        text = f"- Prompt Cache: {stats['hit_rate']:.0%} hit rate ({stats['hits']} hits, {stats['misses']} misses), "
+        text += f"{stats['entries']} prompts, {stats['bytes'] / 2**20:.1f} MB\n"
+        return text
+
+_prompt_cache = None
+_prompt_cache_lock = threading.Lock()
+
+def get_prompt_cache() -> PromptEmbeddingCache:
+    """Process-wide prompt cache configured from the Sidekick config."""
+    global _prompt_cache
+    with _prompt_cache_lock:
+        if _prompt_cache is None:
+            from ...config import load_config
+            _prompt_cache = PromptEmbeddingCache(load_config().prompt_cache_max_mb * 1024 * 1024)
+        return _prompt_cache
@@ -2,9 +2,15 @@
 Image generation node with LoRA support.
 """
 
+import random
+import threading
 import torch
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Tuple
 from ..base import SidekickImageNode
+from ...config import load_config
+from .conditioning import get_prompt_cache
+from .lora_manager import LORA_MODES, get_lora_manager, resolve_lora, restore_base_weights
+from .scheduler import GenerationRequest, MicroBatchScheduler
 
 class SidekickImageGeneratorNode(SidekickImageNode):
     """Enhanced image generation node with LoRA support."""
@@ -29,13 +35,50 @@ class SidekickImageGeneratorNode(SidekickImageNode):
             "optional": {
                 "lora_model": ("LORA_MODEL",),
                 "lora_strength": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 2.0, "step": 0.1}),
+                "lora_name": ("STRING", {"default": ""}),
+                "lora_mode": (LORA_MODES, {"default": "merge"}),
+                "lora_stack": ("LORA_STACK",),
+                "clip": ("CLIP",),
                 "negative_prompt": ("STRING", {"multiline": True, "default": ""}),
             }
         }
     
     def execute(self, model, prompt, width, height, steps, cfg_scale, seed,
-                lora_model=None, lora_strength=1.0, negative_prompt="") -> Tuple:
-        """Generate image with optional LoRA."""
+                lora_model=None, lora_strength=1.0, negative_prompt="", lora_name="",
+                lora_mode="merge", lora_stack=None, clip=None) -> Tuple:
+        """Generate image with optional LoRA.
+        
+        ``lora_model`` (or a file named by ``lora_name`` under the LoRA
+        models path) is applied for the duration of the call; merged
+        variants are cached per model, so switching LoRAs is a weight copy.
+        With ``lora_stack``, every LoRA (plus ``lora_model`` if given) is
+        fused into one concatenated-rank delta per layer.
+        
+        Concurrent calls with the same model, size, steps and LoRA are
+        micro-batched into one forward pass; each keeps its own prompts,
+        CFG scale and seed.
+        With ``clip``, prompts are encoded through a cache shared by all
+        generator nodes, so repeated prompts are only encoded once.
+        """
+        
+        lora = lora_model if lora_model is not None else (lora_name or None)
+        if lora_stack:
+            lora = list(lora_stack) + ([(lora, lora_strength)] if lora is not None else [])
+            lora_strength = 1.0
+        if seed < 0:
+            seed = random.randrange(2**32)
+        
+        lora_id = resolve_lora(lora).lora_id if lora is not None else None
+        request = GenerationRequest(model, prompt, negative_prompt, width, height, steps, cfg_scale, seed,
+                                    lora, lora_strength, lora_mode, lora_id)
+        
+        prompt_cache = get_prompt_cache() if clip is not None else None
+        if prompt_cache is not None:
+            request.conditioning, positive_hit = prompt_cache.encode(clip, prompt)
+            request.negative_conditioning, negative_hit = prompt_cache.encode(clip, negative_prompt)
+        
+        scheduler = get_generation_scheduler()
+        image, lora_info = scheduler.submit(request).result()
         
         # Placeholder implementation
         generation_info = f"Generation Parameters:\n"
@@ -44,11 +87,67 @@ class SidekickImageGeneratorNode(SidekickImageNode):
         generation_info += f"- Steps: {steps}\n"
         generation_info += f"- CFG Scale: {cfg_scale}\n"
         generation_info += f"- Seed: {seed}\n"
+        generation_info += lora_info
+        if prompt_cache is not None:
+            generation_info += f"- Prompt Encoding: positive {'cached' if positive_hit else 'encoded'}, "
+            generation_info += f"negative {'cached' if negative_hit else 'encoded'}\n"
+            generation_info += prompt_cache.summary()
+        generation_info += f"- Batch: {request.batch_size} requests, queue wait {request.queue_wait * 1000:.1f} ms\n"
+        generation_info += scheduler.stats.summary(scheduler.max_batch_size)
         
-        if lora_model is not None:
-            generation_info += f"- LoRA Strength: {lora_strength}\n"
-        
-        # Create placeholder image tensor
-        placeholder_image = torch.zeros((1, 3, height, width))
+        return (image, generation_info)
+
+def _initial_noise(request: GenerationRequest) -> torch.Tensor:
+    # Drawn per request, so batching never changes what a seed produces
+    generator = torch.Generator().manual_seed(request.seed)
+    return torch.randn((4, request.height // 8, request.width // 8), generator=generator)
+
+def generate_batch(requests: List[GenerationRequest]) -> List[Tuple[torch.Tensor, str]]:
+    """Run compatible requests as one batch; returns ``(image, lora info)`` per request.
+
+    Requests share what ``batch_key`` covers (model, size, steps, LoRA);
+    everything else is taken from each request's own row.
+    """
+    first = requests[0]
+    latents = torch.stack([_initial_noise(request) for request in requests])
+    
+    lora_info = ""
+    if first.lora is None:
+        # LoRAs stay merged between generations; this one needs the base
+        restore_base_weights(first.model)
+        images = _sample(requests, latents)
+    else:
+        manager = get_lora_manager(first.model)
+        with manager.applied(first.lora, first.lora_strength, first.lora_mode) as matched:
+            switch_time = manager.last_switch_time
+            images = _sample(requests, latents)
         
-        return (placeholder_image, generation_info)
+        stats = manager.stats()
+        if isinstance(first.lora, list):
+            total_rank = max((layer.down.shape[0] for _, _, layer in matched), default=0)
+            lora_info += f"- LoRA Stack: {len(first.lora)} LoRAs fused to rank {total_rank} ({first.lora_mode}, {len(matched)} layers)\n"
+        else:
+            lora_info += f"- LoRA Strength: {first.lora_strength} ({first.lora_mode}, {len(matched)} layers)\n"
+        lora_info += f"- LoRA Switch: {switch_time * 1000:.1f} ms\n"
+        lora_info += f"- Merged LoRA Cache: {stats['entries']} variants, {stats['bytes'] / 2**20:.0f} MB, "
+        lora_info += f"{stats['hit_rate']:.0%} hit rate\n"
+    
+    return [(image.unsqueeze(0), lora_info) for image in images]
+
+def _sample(requests: List[GenerationRequest], latents: torch.Tensor) -> torch.Tensor:
+    first = requests[0]
+    # Create placeholder image tensors
+    return torch.zeros((latents.shape[0], 3, first.height, first.width))
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_generation_scheduler() -> MicroBatchScheduler:
+    """Process-wide generation scheduler configured from the Sidekick config."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            config = load_config()
+            _scheduler = MicroBatchScheduler(generate_batch, config.generation_batch_window_ms / 1000.0,
+                                             config.generation_max_batch_size)
+        return _scheduler
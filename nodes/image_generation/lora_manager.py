@@ -0,0 +1,399 @@
+"""
+LoRA loading and application for image generation.
+
+LoRA files are memory-mapped, so loading one reads little more than its
+header. A LoRA is applied to a base model in one of two ways:
+
+- ``"merge"`` adds each layer's low-rank delta into the base weight. The
+  original weights of the touched layers are backed up once, merged
+  variants are kept in an LRU keyed by ``(lora_id, strength)`` (both in
+  pinned host memory for CUDA models), and both switching and unmerging
+  are plain tensor copies. A merged variant stays in the model after use,
+  so repeated generations with the same LoRA skip the switch entirely;
+  ``restore_base_weights`` puts the original weights back.
+- ``"runtime"`` leaves the weights alone and adds ``up(down(x))`` to each
+  layer's output with forward hooks.
+
+A stack of LoRAs is fused into a single LoRA whose rank is the sum of
+theirs, so every layer gets one delta however many LoRAs are combined.
+"""
+
+import functools
+import os
+import threading
+import time
+import weakref
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from ...config.paths import get_models_path
+from ...utils.cache import fingerprint
+from ...utils.tensor_io import load_tensors
+from ..lora_training.lora import LoRAModel, get_diffusion_module
+
+LORA_MODES = ["merge", "runtime"]
+LORA_EXTENSIONS = (".safetensors", ".pt")
+
+# Memory-mapped LoRA files kept open
+MAX_LOADED_FILES = 32
+
+# Key prefixes of LoRA files from other trainers that name the UNet explicitly
+_LAYER_PREFIXES = ("lora_unet_", "diffusion_model.", "diffusion_model_")
+
+def _normalize_layer_name(name: str) -> str:
+    for prefix in _LAYER_PREFIXES:
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+            break
+    return name.replace(".", "_")
+
+@dataclass
+class LoRALayer:
+    """Low-rank factors of one layer's update."""
+
+    down: torch.Tensor
+    up: torch.Tensor
+    scale: float
+
+    def delta(self, shape: torch.Size, device: torch.device) -> torch.Tensor:
+        """Full float32 weight update of the layer."""
+        up = self.up.to(device, torch.float32).flatten(1)
+        down = self.down.to(device, torch.float32).flatten(1)
+        return (up @ down).reshape(shape) * self.scale
+
+@dataclass
+class LoRAWeights:
+    """A loaded LoRA: its identity and per-layer factors."""
+
+    lora_id: str
+    name: str
+    layers: Dict[str, LoRALayer]
+
+    @property
+    def rank(self) -> int:
+        return max((layer.down.shape[0] for layer in self.layers.values()), default=0)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(layer.down.nbytes + layer.up.nbytes for layer in self.layers.values())
+
+def parse_lora_layers(state_dict: Dict[str, torch.Tensor]) -> Dict[str, LoRALayer]:
+    """Group ``<layer>.lora_down.weight`` / ``lora_up.weight`` / ``alpha`` keys."""
+    layers = {}
+    for key, down in state_dict.items():
+        if not key.endswith(".lora_down.weight"):
+            continue
+        name = key[:-len(".lora_down.weight")]
+        up = state_dict.get(f"{name}.lora_up.weight")
+        if up is None:
+            continue
+        rank = down.shape[0]
+        alpha = state_dict.get(f"{name}.alpha")
+        scale = float(alpha) / rank if alpha is not None else 1.0
+        layers[name] = LoRALayer(down, up, scale)
+    return layers
+
+def resolve_lora_path(name: str) -> str:
+    """Find a LoRA file by path, or by name under the LoRA models directory."""
+    candidates = [name] if os.path.isabs(name) else [name, os.path.join(get_models_path(), name)]
+    for candidate in list(candidates):
+        if not candidate.lower().endswith(LORA_EXTENSIONS):
+            candidates.extend(candidate + extension for extension in LORA_EXTENSIONS)
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return os.path.abspath(candidate)
+    raise ValueError(f"LoRA '{name}' not found in {get_models_path()}")
+
+_loaded_files: "OrderedDict[str, Tuple[Tuple[int, int], LoRAWeights]]" = OrderedDict()
+_loaded_files_lock = threading.Lock()
+
+def load_lora_file(name: str) -> LoRAWeights:
+    """Memory-map a LoRA file; repeated loads of an unchanged file are free.
+
+    The ``MAX_LOADED_FILES`` most recently used files stay mapped.
+    """
+    path = resolve_lora_path(name)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _loaded_files_lock:
+        cached = _loaded_files.get(path)
+        if cached is not None and cached[0] == signature:
+            _loaded_files.move_to_end(path)
+            return cached[1]
+
+    if path.endswith(".pt"):
+        state_dict = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    else:
+        state_dict, _ = load_tensors(path)
+    layers = parse_lora_layers(state_dict)
+    if not layers:
+        raise ValueError(f"'{path}' contains no LoRA layers")
+    weights = LoRAWeights(f"{path}:{signature[0]}:{signature[1]}", os.path.basename(path), layers)
+    with _loaded_files_lock:
+        _loaded_files[path] = (signature, weights)
+        _loaded_files.move_to_end(path)
+        while len(_loaded_files) > MAX_LOADED_FILES:
+            _loaded_files.popitem(last=False)
+    return weights
+
+_fused_stacks = OrderedDict()
+_fused_bytes = 0
+_fused_lock = threading.Lock()
+
+def fuse_loras(stack: Sequence[Tuple[object, float]]) -> LoRAWeights:
+    """Combine ``(lora, strength)`` pairs into one concatenated-rank LoRA.
+
+    Each layer's down-projections are stacked along the rank dimension and
+    its up-projections, pre-multiplied by every LoRA's scale and strength,
+    along the matching dimension, so one ``up @ down`` equals the sum of
+    the individual deltas. Fused stacks are cached by the fingerprint of
+    their ``(lora_id, strength)`` pairs.
+    """
+    global _fused_bytes
+    resolved = [(resolve_lora(lora), float(strength)) for lora, strength in stack if strength != 0]
+    if not resolved:
+        raise ValueError("LoRA stack has no LoRAs with a non-zero strength")
+    key = fingerprint([(weights.lora_id, strength) for weights, strength in resolved])
+    with _fused_lock:
+        fused = _fused_stacks.get(key)
+        if fused is not None:
+            _fused_stacks.move_to_end(key)
+            return fused
+
+    factors: Dict[str, Tuple[str, List[torch.Tensor], List[torch.Tensor]]] = {}
+    for weights, strength in resolved:
+        for name, layer in weights.layers.items():
+            # LoRAs may name the same layer differently
+            entry = factors.setdefault(_normalize_layer_name(name), (name, [], []))
+            entry[1].append(layer.down.float())
+            entry[2].append(layer.up.float() * (layer.scale * strength))
+    layers = {name: LoRALayer(torch.cat(downs, dim=0), torch.cat(ups, dim=1), 1.0)
+              for name, downs, ups in factors.values()}
+    names = " + ".join(f"{weights.name}@{strength:g}" for weights, strength in resolved)
+    fused = LoRAWeights(f"stack:{key}", names, layers)
+
+    # Fused stacks are materialized rather than mapped, so they get their own budget
+    from ...config import load_config
+    max_bytes = load_config().lora_fused_cache_mb * 1024 * 1024
+    with _fused_lock:
+        if key not in _fused_stacks and fused.nbytes <= max_bytes:
+            _fused_stacks[key] = fused
+            _fused_bytes += fused.nbytes
+            while _fused_bytes > max_bytes:
+                _, evicted = _fused_stacks.popitem(last=False)
+                _fused_bytes -= evicted.nbytes
+    return fused
+
+def resolve_lora(lora: Union[LoRAModel, LoRAWeights, str, list]) -> LoRAWeights:
+    """Load a ``LORA_MODEL`` value, loaded weights, a LoRA file name, or a
+    ``LORA_STACK`` list of ``(lora, strength)`` pairs."""
+    if isinstance(lora, LoRAWeights):
+        return lora
+    if isinstance(lora, list):
+        return fuse_loras(lora)
+    if isinstance(lora, str):
+        return load_lora_file(lora)
+    if isinstance(lora, LoRAModel):
+        # Prefer the saved file, which is memory-mapped instead of held in RAM
+        if lora.path and os.path.isfile(lora.path):
+            return load_lora_file(lora.path)
+        return LoRAWeights(fingerprint(lora.state_dict), lora.name, parse_lora_layers(lora.state_dict))
+    raise ValueError(f"Unsupported LoRA value of type {type(lora).__name__}")
+
+def _host_copy(tensor: torch.Tensor) -> torch.Tensor:
+    """Host copy of a weight, pinned when it lives on a CUDA device so
+    copying it back can overlap with other work."""
+    if tensor.is_cuda:
+        return torch.empty(tensor.shape, dtype=tensor.dtype, pin_memory=True).copy_(tensor)
+    return tensor.detach().to("cpu", copy=True)
+
+def _runtime_hook(layer: LoRALayer, strength: float, module: nn.Module, inputs: Tuple,
+                  output: torch.Tensor) -> torch.Tensor:
+    x = inputs[0].to(layer.down.dtype)
+    if isinstance(module, nn.Conv2d):
+        hidden = F.conv2d(x, layer.down, None, module.stride, module.padding, module.dilation)
+        delta = F.conv2d(hidden, layer.up)
+    else:
+        delta = F.linear(F.linear(x, layer.down), layer.up)
+    return output + (delta * (layer.scale * strength)).to(output.dtype)
+
+class LoRAManager:
+    """Applies LoRAs to one base model and caches merged variants.
+
+    Args:
+        module: Model whose ``nn.Linear`` / ``nn.Conv2d`` layers are adapted.
+        max_cache_bytes: Budget of the merged-variant LRU.
+    """
+
+    def __init__(self, module: nn.Module, max_cache_bytes: int):
+        self.module = module
+        self.max_cache_bytes = max_cache_bytes
+        self.active: Optional[Tuple[str, float, str]] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.last_switch_time = 0.0
+        self._targets: Optional[Dict[str, Tuple[str, nn.Module]]] = None
+        self._originals: Dict[str, torch.Tensor] = {}
+        self._merged = OrderedDict()
+        self._merged_bytes = 0
+        self._active_layers: List[str] = []
+        self._hooks = []
+        self._lock = threading.RLock()
+
+    def match(self, weights: LoRAWeights) -> List[Tuple[str, nn.Module, LoRALayer]]:
+        """``(layer name, module, factors)`` of every LoRA layer present in the model."""
+        if self._targets is None:
+            self._targets = {_normalize_layer_name(name): (name, module)
+                             for name, module in self.module.named_modules()
+                             if isinstance(module, (nn.Linear, nn.Conv2d))}
+        matched = []
+        for name, layer in weights.layers.items():
+            target = self._targets.get(_normalize_layer_name(name))
+            if target is not None:
+                matched.append((target[0], target[1], layer))
+        return matched
+
+    def apply(self, lora, strength: float = 1.0, mode: str = "merge") -> List[Tuple[str, nn.Module, LoRALayer]]:
+        """Make the model reflect exactly one LoRA (or fused stack) at ``strength``.
+
+        Returns the matched layers. Any previously applied LoRA is removed.
+        """
+        if mode not in LORA_MODES:
+            raise ValueError(f"Unsupported LoRA mode '{mode}', expected one of {LORA_MODES}")
+        weights = resolve_lora(lora)
+        with self._lock:
+            start = time.perf_counter()
+            matched = self.match(weights)
+            if not matched:
+                raise ValueError(f"LoRA '{weights.name}' has no layers matching the model")
+            key = (weights.lora_id, float(strength), mode)
+            if self.active != key:
+                if mode == "merge":
+                    self._apply_merged(weights.lora_id, float(strength), matched)
+                else:
+                    self.restore()
+                    for _, module, layer in matched:
+                        device = module.weight.device
+                        # Move the factors once rather than on every forward
+                        moved = LoRALayer(layer.down.to(device, torch.float32), layer.up.to(device, torch.float32),
+                                          layer.scale)
+                        self._hooks.append(module.register_forward_hook(
+                            functools.partial(_runtime_hook, moved, float(strength))))
+                self.active = key
+            self.last_switch_time = time.perf_counter() - start
+            return matched
+
+    def restore(self) -> None:
+        """Remove the applied LoRA, copying back the original weights."""
+        with self._lock:
+            for handle in self._hooks:
+                handle.remove()
+            self._hooks = []
+            self._restore_layers(self._active_layers)
+            self._active_layers = []
+            self.active = None
+
+    @contextmanager
+    def applied(self, lora, strength: float = 1.0, mode: str = "merge"):
+        """Apply a LoRA for the duration of a block.
+
+        The LoRA is left applied afterwards, so the next block with the
+        same LoRA, strength and mode skips the switch; applying another
+        LoRA or calling ``restore`` replaces it.
+        """
+        with self._lock:
+            yield self.apply(lora, strength, mode)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._merged),
+                "bytes": self._merged_bytes,
+                "backup_bytes": sum(t.nbytes for t in self._originals.values()),
+            }
+
+    def _apply_merged(self, lora_id: str, strength: float,
+                      matched: List[Tuple[str, nn.Module, LoRALayer]]) -> None:
+        for handle in self._hooks:
+            handle.remove()
+        self._hooks = []
+        names = [name for name, _, _ in matched]
+        # Layers the new variant overwrites need no restore first
+        self._restore_layers(sorted(set(self._active_layers) - set(names)))
+        for name, module, _ in matched:
+            if name not in self._originals:
+                self._originals[name] = _host_copy(module.weight.detach())
+
+        variant = self._merged.get((lora_id, strength))
+        with torch.no_grad():
+            if variant is not None:
+                self._merged.move_to_end((lora_id, strength))
+                self.hits += 1
+                for name, module, _ in matched:
+                    module.weight.copy_(variant[0][name], non_blocking=True)
+            else:
+                self.misses += 1
+                merged = {}
+                for name, module, layer in matched:
+                    weight = module.weight
+                    original = self._originals[name].to(weight.device, torch.float32)
+                    weight.copy_(original + layer.delta(weight.shape, weight.device) * strength)
+                    merged[name] = _host_copy(weight.detach())
+                self._store_variant((lora_id, strength), merged)
+        self._active_layers = names
+
+    def _restore_layers(self, names: List[str]) -> None:
+        if not names:
+            return
+        modules = dict(self.module.named_modules())
+        with torch.no_grad():
+            for name in names:
+                modules[name].weight.copy_(self._originals[name], non_blocking=True)
+
+    def _store_variant(self, key: Tuple[str, float], merged: Dict[str, torch.Tensor]) -> None:
+        size = sum(tensor.nbytes for tensor in merged.values())
+        if size > self.max_cache_bytes:
+            return
+        self._merged[key] = (merged, size)
+        self._merged_bytes += size
+        while self._merged_bytes > self.max_cache_bytes:
+            _, (_, evicted_size) = self._merged.popitem(last=False)
+            self._merged_bytes -= evicted_size
+            self.evictions += 1
+
+_managers = weakref.WeakKeyDictionary()
+_managers_lock = threading.Lock()
+
+def get_lora_manager(model) -> LoRAManager:
+    """The LoRA manager of a model, shared by every node that uses it."""
+    module = get_diffusion_module(model)
+    with _managers_lock:
+        manager = _managers.get(module)
+        if manager is None:
+            from ...config import load_config
+            max_bytes = load_config().lora_merge_cache_mb * 1024 * 1024
+            manager = LoRAManager(module, max_bytes)
+            _managers[module] = manager
+    return manager
+
+def restore_base_weights(model) -> None:
+    """Remove any LoRA a manager left applied to ``model``."""
+    try:
+        module = get_diffusion_module(model)
+    except ValueError:
+        # Not a model LoRAs can be applied to, so none is applied
+        return
+    with _managers_lock:
+        manager = _managers.get(module)
+    if manager is not None:
+        manager.restore()
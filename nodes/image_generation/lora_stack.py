@@ -0,0 +1,45 @@
+"""
+LoRA stacking node.
+"""
+
+from typing import Dict, Any, Tuple
+from ..base import SidekickBaseNode
+
+class LoRAStackNode(SidekickBaseNode):
+    """Node for adding a LoRA and its strength to a stack of LoRAs."""
+    
+    CATEGORY = "sidekick/lora"
+    DISPLAY_NAME = "LoRA Stack"
+    RETURN_TYPES = ("LORA_STACK", "STRING")
+    RETURN_NAMES = ("lora_stack", "stack_info")
+    
+    @classmethod
+    def INPUT_TYPES(cls) -> Dict[str, Any]:
+        return {
+            "required": {
+                "strength": ("FLOAT", {"default": 1.0, "min": -2.0, "max": 2.0, "step": 0.05}),
+            },
+            "optional": {
+                "lora_model": ("LORA_MODEL",),
+                "lora_name": ("STRING", {"default": ""}),
+                "lora_stack": ("LORA_STACK",),
+            }
+        }
+    
+    def execute(self, strength, lora_model=None, lora_name="", lora_stack=None) -> Tuple:
+        """Append ``lora_model`` (or the file named ``lora_name``) to ``lora_stack``.
+        
+        Chain several of these nodes to combine LoRAs; the generator fuses
+        the whole stack into one low-rank delta per layer.
+        """
+        stack = list(lora_stack or [])
+        lora = lora_model if lora_model is not None else (lora_name or None)
+        if lora is not None:
+            stack.append((lora, strength))
+        
+        stack_info = f"LoRA Stack ({len(stack)} LoRAs):\n"
+        for entry, entry_strength in stack:
+            name = entry if isinstance(entry, str) else getattr(entry, "name", type(entry).__name__)
+            stack_info += f"- {name}: {entry_strength}\n"
+        
+        return (stack, stack_info)
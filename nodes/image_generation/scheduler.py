@@ -0,0 +1,183 @@
+"""
+Micro-batching of generation requests.
+
+Concurrent requests that can share a forward pass (same model, size,
+step count and LoRA) are held for a short window and run as one batch;
+each request still gets its own result. Queue wait and batch fill are
+tracked so the window can be tuned.
+"""
+
+import threading
+import time
+import torch
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+@dataclass
+class GenerationRequest:
+    """One image generation call."""
+
+    model: Any
+    prompt: str
+    negative_prompt: str
+    width: int
+    height: int
+    steps: int
+    cfg_scale: float
+    seed: int
+    lora: Any = None
+    lora_strength: float = 1.0
+    lora_mode: str = "merge"
+    lora_id: Optional[str] = None
+    conditioning: Any = None
+    negative_conditioning: Any = None
+    # Filled in by the scheduler
+    queue_wait: float = 0.0
+    batch_size: int = 1
+
+    def batch_key(self) -> Hashable:
+        """Requests with equal keys can run in one batch.
+
+        Prompts, conditioning, CFG scale and seed are per row of the batch.
+        """
+        return (id(self.model), self.width, self.height, self.steps,
+                self.lora_id, self.lora_strength, self.lora_mode, self.conditioning is not None)
+
+@dataclass
+class SchedulerStats:
+    """Queue wait and batch fill of a scheduler."""
+
+    requests: int = 0
+    batches: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    batch_sizes: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.requests if self.requests else 0.0
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    def summary(self, max_batch_size: int) -> str:
+        text = f"- Scheduler: {self.requests} requests in {self.batches} batches "
+        text += f"({self.mean_batch_size:.2f} per batch, {self.mean_batch_size / max_batch_size:.0%} fill)\n"
+        text += f"- Queue Wait: {self.mean_wait * 1000:.1f} ms mean, {self.max_wait * 1000:.1f} ms max\n"
+        return text
+
+class MicroBatchScheduler:
+    """Coalesce compatible requests into batches.
+
+    The first request of a batch waits at most ``window`` seconds for
+    others with the same ``batch_key``; a batch runs as soon as it holds
+    ``max_batch_size`` requests. Batches run one at a time on a dispatcher
+    thread, and requests arriving meanwhile form the next batches.
+
+    Args:
+        run_batch: Runs a list of requests, returning one result per request.
+        window: Longest wait for more requests, in seconds; 0 disables batching.
+        max_batch_size: Largest batch.
+    """
+
+    def __init__(self, run_batch: Callable[[List[GenerationRequest]], List[Any]],
+                 window: float = 0.01, max_batch_size: int = 8):
+        self.run_batch = run_batch
+        self.window = max(0.0, window)
+        self.max_batch_size = max(1, max_batch_size)
+        self.stats = SchedulerStats()
+        self._pending: "OrderedDict[Hashable, Tuple[float, List[Tuple[GenerationRequest, Future, float]]]]" = OrderedDict()
+        self._condition = threading.Condition()
+        self._run_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def submit(self, request: GenerationRequest) -> Future:
+        """Queue a request; the future resolves to its result."""
+        future = Future()
+        submitted = time.perf_counter()
+        if self.window == 0 or self.max_batch_size == 1:
+            self._run([(request, future, submitted)])
+            return future
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Generation scheduler is closed")
+            key = request.batch_key()
+            if key not in self._pending:
+                self._pending[key] = (submitted + self.window, [])
+            self._pending[key][1].append((request, future, submitted))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name="sidekick-generation-scheduler",
+                                                daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    def close(self) -> None:
+        """Run what is queued and stop the dispatcher."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    ready = self._next_ready()
+                    if ready is not None or (self._closed and not self._pending):
+                        break
+                    deadline = min(entry[0] for entry in self._pending.values()) if self._pending else None
+                    timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                    self._condition.wait(timeout)
+                if ready is None:
+                    return
+            self._run(ready)
+
+    def _next_ready(self) -> Optional[List[Tuple[GenerationRequest, Future, float]]]:
+        """Pop the first full or expired batch, oldest first."""
+        now = time.perf_counter()
+        for key, (deadline, entries) in self._pending.items():
+            if len(entries) >= self.max_batch_size or deadline <= now or self._closed:
+                batch = entries[:self.max_batch_size]
+                remaining = entries[self.max_batch_size:]
+                if remaining:
+                    # Overflow starts a new window of its own
+                    self._pending[key] = (now + self.window, remaining)
+                    self._pending.move_to_end(key)
+                else:
+                    del self._pending[key]
+                return batch
+        return None
+
+    def _run(self, batch: List[Tuple[GenerationRequest, Future, float]]) -> None:
+        with self._run_lock:
+            start = time.perf_counter()
+            requests = [request for request, _, _ in batch]
+            for request, _, submitted in batch:
+                request.queue_wait = start - submitted
+                request.batch_size = len(batch)
+            with self._condition:
+                self.stats.requests += len(batch)
+                self.stats.batches += 1
+                self.stats.batch_sizes[len(batch)] = self.stats.batch_sizes.get(len(batch), 0) + 1
+                for request in requests:
+                    self.stats.total_wait += request.queue_wait
+                    self.stats.max_wait = max(self.stats.max_wait, request.queue_wait)
+            try:
+                # The dispatcher thread does not inherit ComfyUI's inference mode
+                with torch.inference_mode():
+                    results = self.run_batch(requests)
+            except BaseException as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                return
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+            for _, future, _ in batch[len(results):]:
+                future.set_exception(RuntimeError(f"Batch returned {len(results)} results for {len(batch)} requests"))
@@ -2,8 +2,13 @@
 Line art processing and colorization nodes.
 """
 
-from .cleanup import LineArtCleanupNode
-from .colorization import LineArtColorizationNode
-from .enhancement import LineArtEnhancementNode
+from ..registry import lazy_exports
+
+# Node modules are imported when their class is first accessed
+__getattr__ = lazy_exports(__name__, {
+    "LineArtCleanupNode": ".cleanup",
+    "LineArtColorizationNode": ".colorization",
+    "LineArtEnhancementNode": ".enhancement",
+})
 
 __all__ = ["LineArtCleanupNode", "LineArtColorizationNode", "LineArtEnhancementNode"]
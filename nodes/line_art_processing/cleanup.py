@@ -2,11 +2,12 @@
 Line art cleanup and enhancement nodes.
 """
 
-import torch
-import cv2
-import numpy as np
 from typing import Dict, Any, Tuple
 from ..base import SidekickImageNode
+from ...config import load_config
+from ...utils.image_utils import to_bhwc
+from .processing import BACKENDS, CleanupParams, cleanup_batch
+from .tiling import cleanup_tiled
 
 class LineArtCleanupNode(SidekickImageNode):
     """Node for cleaning up line art drawings."""
@@ -15,6 +16,7 @@ class LineArtCleanupNode(SidekickImageNode):
     DISPLAY_NAME = "Line Art Cleanup"
     RETURN_TYPES = ("IMAGE", "STRING")
     RETURN_NAMES = ("cleaned_image", "cleanup_info")
+    DETERMINISTIC = True
     
     @classmethod
     def INPUT_TYPES(cls) -> Dict[str, Any]:
@@ -29,64 +31,41 @@ class LineArtCleanupNode(SidekickImageNode):
                 "auto_contrast": ("BOOLEAN", {"default": True}),
                 "remove_artifacts": ("BOOLEAN", {"default": True}),
                 "smooth_lines": ("BOOLEAN", {"default": False}),
+                "min_artifact_area": ("INT", {"default": 50, "min": 1, "max": 10000}),
+                "fill_holes": ("BOOLEAN", {"default": False}),
+                "backend": (BACKENDS, {"default": "auto"}),
+                "num_workers": ("INT", {"default": 0, "min": 0, "max": 64}),
+                "tile_size": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 64}),
             }
         }
     
     def execute(self, image, threshold, noise_reduction, line_thickness,
-                auto_contrast=True, remove_artifacts=True, smooth_lines=False) -> Tuple:
-        """Clean up line art image."""
+                auto_contrast=True, remove_artifacts=True, smooth_lines=False,
+                min_artifact_area=50, fill_holes=False, backend="auto", num_workers=0,
+                tile_size=0) -> Tuple:
+        """Clean up a batch of line art images."""
         
-        # Convert tensor to numpy for processing
-        if len(image.shape) == 4:
-            image = image.squeeze(0)
+        params = CleanupParams(
+            threshold=threshold,
+            noise_reduction=noise_reduction,
+            auto_contrast=auto_contrast,
+            remove_artifacts=remove_artifacts,
+            smooth_lines=smooth_lines,
+            min_area=min_artifact_area,
+            fill_holes=fill_holes,
+        )
         
-        if image.shape[0] == 3:  # CHW to HWC
-            image = image.permute(1, 2, 0)
+        # Scans larger than max_image_size are cleaned in tiles to bound memory
+        max_image_size = load_config().max_image_size
+        height, width = to_bhwc(image).shape[1:3]
+        if tile_size <= 0 and max(height, width) > max_image_size:
+            tile_size = max_image_size
         
-        img_np = (image.cpu().numpy() * 255).astype(np.uint8)
-        
-        # Convert to grayscale for line art processing
-        if len(img_np.shape) == 3:
-            gray = cv2.cvtColor(img_np, cv2.COLOR_RGB2GRAY)
+        if tile_size > 0:
+            result_tensor = cleanup_tiled(image, params, tile_size, backend=backend, num_workers=num_workers)
         else:
-            gray = img_np
-        
-        # Apply threshold
-        _, binary = cv2.threshold(gray, int(threshold * 255), 255, cv2.THRESH_BINARY)
-        
-        # Noise reduction
-        if noise_reduction > 0:
-            kernel_size = max(1, int(noise_reduction * 5))
-            kernel = np.ones((kernel_size, kernel_size), np.uint8)
-            binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
-            binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
-        
-        # Remove small artifacts
-        if remove_artifacts:
-            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            min_area = 50  # Minimum area to keep
-            for contour in contours:
-                if cv2.contourArea(contour) < min_area:
-                    cv2.fillPoly(binary, [contour], 255)
-        
-        # Smooth lines
-        if smooth_lines:
-            binary = cv2.GaussianBlur(binary, (3, 3), 0)
-            _, binary = cv2.threshold(binary, 127, 255, cv2.THRESH_BINARY)
-        
-        # Auto contrast
-        if auto_contrast:
-            binary = cv2.equalizeHist(binary)
-        
-        # Convert back to RGB tensor
-        if len(binary.shape) == 2:
-            binary_rgb = cv2.cvtColor(binary, cv2.COLOR_GRAY2RGB)
-        else:
-            binary_rgb = binary
-        
-        # Convert back to tensor
-        result_tensor = torch.from_numpy(binary_rgb.astype(np.float32) / 255.0)
-        result_tensor = result_tensor.permute(2, 0, 1).unsqueeze(0)  # HWC to BCHW
+            # Process the whole batch in one call
+            result_tensor = cleanup_batch(image, params, backend=backend, num_workers=num_workers)
         
         cleanup_info = f"Line Art Cleanup Applied:\n"
         cleanup_info += f"- Threshold: {threshold}\n"
@@ -94,6 +73,12 @@ class LineArtCleanupNode(SidekickImageNode):
         cleanup_info += f"- Line Thickness: {line_thickness}\n"
         cleanup_info += f"- Auto Contrast: {auto_contrast}\n"
         cleanup_info += f"- Remove Artifacts: {remove_artifacts}\n"
+        if remove_artifacts:
+            cleanup_info += f"- Min Artifact Area: {min_artifact_area}px\n"
+            cleanup_info += f"- Fill Holes: {fill_holes}\n"
         cleanup_info += f"- Smooth Lines: {smooth_lines}\n"
+        cleanup_info += f"- Frames: {result_tensor.shape[0]}\n"
+        if tile_size > 0:
+            cleanup_info += f"- Tile Size: {tile_size}px\n"
         
         return (result_tensor, cleanup_info)
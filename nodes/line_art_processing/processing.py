@@ -0,0 +1,337 @@
+"""
+Batched line art cleanup backends.
+
+Two interchangeable backends are provided:
+
+- ``torch``: threshold, morphology, smoothing and histogram equalization run
+  as tensor ops on the input's device for the whole batch at once.
+- ``opencv``: the classic per-frame OpenCV pipeline, fanned out over a
+  thread pool (OpenCV releases the GIL, so frames run in parallel).
+
+Both backends apply the same pipeline; the torch grayscale conversion can
+differ from OpenCV's by one level on exact rounding ties.
+"""
+
+import os
+import cv2
+import torch
+import numpy as np
+import torch.nn.functional as F
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional
+from ...utils.image_utils import to_bhwc, quantize_uint8, tensor_to_numpy_uint8
+
+BACKENDS = ["auto", "torch", "opencv"]
+
+# Fixed-point BT.601 luma weights (sum to 1 << _GRAY_SHIFT)
+_GRAY_SHIFT = 16
+_GRAY_WEIGHTS = (19595, 38470, 7471)
+
+@dataclass
+class CleanupParams:
+    """Parameters shared by all cleanup backends."""
+
+    threshold: float = 0.5
+    noise_reduction: float = 0.3
+    auto_contrast: bool = True
+    remove_artifacts: bool = True
+    smooth_lines: bool = False
+    min_area: int = 50
+    fill_holes: bool = False
+
+    @property
+    def threshold_value(self) -> int:
+        """Threshold on the 0-255 scale."""
+        return int(self.threshold * 255)
+
+    @property
+    def kernel_size(self) -> int:
+        """Morphology kernel size, or 0 when noise reduction is disabled."""
+        if self.noise_reduction <= 0:
+            return 0
+        return max(1, int(self.noise_reduction * 5))
+
+def resolve_workers(num_workers: int = 0) -> int:
+    """Resolve a worker count, where 0 means one worker per CPU."""
+    if num_workers and num_workers > 0:
+        return num_workers
+    return os.cpu_count() or 1
+
+def rgb_to_gray(image: torch.Tensor) -> torch.Tensor:
+    """Convert a uint8 BHWC tensor to a uint8 BHW grayscale tensor.
+
+    Uses integer fixed-point arithmetic so the result is deterministic on
+    every device.
+    """
+    if image.shape[-1] == 1:
+        return image[..., 0]
+    rgb = image[..., :3].to(torch.int32)
+    r, g, b = _GRAY_WEIGHTS
+    gray = rgb[..., 0] * r + rgb[..., 1] * g + rgb[..., 2] * b
+    gray = (gray + (1 << (_GRAY_SHIFT - 1))) >> _GRAY_SHIFT
+    return gray.to(torch.uint8)
+
+def gray_to_tensor(gray: torch.Tensor) -> torch.Tensor:
+    """Convert a uint8 BHW batch to a float32 BCHW RGB tensor."""
+    result = gray.to(torch.float32).div_(255.0)
+    b, h, w = result.shape
+    return result.unsqueeze(1).expand(b, 3, h, w).contiguous()
+
+def frame_to_gray(frame: torch.Tensor) -> np.ndarray:
+    """Convert a single-frame [1, H, W, C] float tensor (or crop) to uint8 grayscale."""
+    frame = tensor_to_numpy_uint8(frame)[0]
+    if frame.shape[-1] == 1:
+        return np.ascontiguousarray(frame[..., 0])
+    if frame.shape[-1] == 4:
+        return cv2.cvtColor(frame, cv2.COLOR_RGBA2GRAY)
+    return cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+
+def cleanup_frame(gray: np.ndarray, params: CleanupParams) -> np.ndarray:
+    """Run the full OpenCV cleanup pipeline on one uint8 grayscale frame."""
+    _, binary = cv2.threshold(gray, params.threshold_value, 255, cv2.THRESH_BINARY)
+
+    # Noise reduction
+    if params.kernel_size:
+        kernel = np.ones((params.kernel_size, params.kernel_size), np.uint8)
+        binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+        binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
+
+    if params.remove_artifacts:
+        binary = remove_specks(binary, params.min_area, params.fill_holes)
+
+    if params.smooth_lines:
+        binary = cv2.GaussianBlur(binary, (3, 3), 0)
+        _, binary = cv2.threshold(binary, 127, 255, cv2.THRESH_BINARY)
+
+    if params.auto_contrast:
+        binary = cv2.equalizeHist(binary)
+
+    return binary
+
+def remove_specks(binary: np.ndarray, min_area: int = 50,
+                  fill_holes: bool = False) -> np.ndarray:
+    """Remove small ink specks (and optionally small holes) from a binary frame.
+
+    Ink is black (0) on white (255). One connected-components pass labels the
+    ink, the per-label areas act as a histogram and a single lookup builds the
+    mask of pixels to clear, so the cost is linear in pixels regardless of
+    how many specks the frame contains.
+
+    Args:
+        binary: uint8 frame containing only 0 and 255, modified in place.
+        min_area: Components smaller than this many pixels are removed.
+        fill_holes: Also fill white regions smaller than ``min_area`` that are
+            fully enclosed by ink.
+    """
+    ink = (binary == 0).view(np.uint8)
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    small = stats[:, cv2.CC_STAT_AREA] < min_area
+    small[0] = False  # label 0 is the paper
+    if small.any():
+        binary[np.take(small, labels)] = 255
+
+    if fill_holes:
+        paper = (binary != 0).view(np.uint8)
+        _, labels, stats, _ = cv2.connectedComponentsWithStats(paper, connectivity=4)
+        height, width = binary.shape
+        left = stats[:, cv2.CC_STAT_LEFT]
+        top = stats[:, cv2.CC_STAT_TOP]
+        enclosed = ((left > 0) & (top > 0) &
+                    (left + stats[:, cv2.CC_STAT_WIDTH] < width) &
+                    (top + stats[:, cv2.CC_STAT_HEIGHT] < height))
+        holes = (stats[:, cv2.CC_STAT_AREA] < min_area) & enclosed
+        holes[0] = False  # label 0 is the ink
+        if holes.any():
+            binary[np.take(holes, labels)] = 0
+
+    return binary
+
+def map_frames(fn, frames: np.ndarray, num_workers: int = 0) -> np.ndarray:
+    """Apply a per-frame function over a [B, H, W] array using a thread pool."""
+    workers = min(resolve_workers(num_workers), len(frames))
+    if workers <= 1:
+        results = [fn(frame) for frame in frames]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(fn, frames))
+    return np.stack(results)
+
+def cleanup_batch_opencv(image: torch.Tensor, params: CleanupParams,
+                         num_workers: int = 0) -> torch.Tensor:
+    """Clean a float BHWC batch frame-by-frame with OpenCV on a thread pool.
+
+    Each worker converts, cleans and writes its frame straight into a
+    preallocated float32 BCHW output, so no per-frame tensors are collected.
+    """
+    b, h, w = image.shape[:3]
+    result = torch.empty((b, 3, h, w), dtype=torch.float32)
+
+    def process(index: int) -> None:
+        gray = frame_to_gray(image[index:index + 1])
+        binary = torch.from_numpy(cleanup_frame(gray, params))
+        result[index].copy_(binary.unsqueeze(0).expand(3, h, w)).div_(255.0)
+
+    workers = min(resolve_workers(num_workers), b)
+    if workers <= 1:
+        for index in range(b):
+            process(index)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(process, range(b)))
+    return result
+
+def _dilate(mask: torch.Tensor, kernel_size: int) -> torch.Tensor:
+    """Binary dilation of a B1HW float mask with a square kernel.
+
+    Padding mirrors OpenCV's anchor placement (kernel_size // 2) so even
+    kernel sizes match ``cv2.morphologyEx`` exactly.
+    """
+    before = kernel_size // 2
+    after = kernel_size - 1 - before
+    padded = F.pad(mask, (before, after, before, after), value=0.0)
+    return F.max_pool2d(padded, kernel_size, stride=1)
+
+def _erode(mask: torch.Tensor, kernel_size: int) -> torch.Tensor:
+    """Binary erosion, treating pixels outside the image as set."""
+    return 1.0 - _dilate(1.0 - mask, kernel_size)
+
+def _smooth(mask: torch.Tensor) -> torch.Tensor:
+    """3x3 Gaussian blur followed by re-thresholding at 127.
+
+    On a 0/255 image the blurred value is ``k * 255 / 16`` for an integer
+    weight sum ``k``, so the OpenCV threshold reduces to ``k >= 8``.
+    """
+    kernel = torch.tensor([[1.0, 2.0, 1.0], [2.0, 4.0, 2.0], [1.0, 2.0, 1.0]],
+                          dtype=mask.dtype, device=mask.device).view(1, 1, 3, 3)
+    padded = F.pad(mask, (1, 1, 1, 1), mode='reflect')
+    return (F.conv2d(padded, kernel) >= 8.0).to(mask.dtype)
+
+def equalize_hist(gray: torch.Tensor) -> torch.Tensor:
+    """Per-frame histogram equalization of a uint8 BHW batch.
+
+    Mirrors ``cv2.equalizeHist``: the lowest occupied bin maps to 0 and a
+    constant frame is left unchanged.
+    """
+    b = gray.shape[0]
+    flat = gray.reshape(b, -1).to(torch.int64)
+    total = flat.shape[1]
+    hist = torch.zeros((b, 256), dtype=torch.int64, device=gray.device)
+    hist.scatter_add_(1, flat, torch.ones_like(flat))
+
+    first = (hist > 0).to(torch.int64).argmax(dim=1, keepdim=True)
+    first_count = hist.gather(1, first)
+    constant = (first_count == total).squeeze(1)
+
+    cdf = hist.cumsum(dim=1) - first_count
+    scale = 255.0 / (total - first_count).clamp_(min=1).to(torch.float32)
+    lut = torch.round(cdf.to(torch.float32) * scale).clamp_(0, 255).to(torch.uint8)
+
+    result = lut.gather(1, flat).reshape(gray.shape)
+    if constant.any():
+        result[constant] = gray[constant]
+    return result
+
+def cleanup_batch_torch(gray: torch.Tensor, params: CleanupParams,
+                        num_workers: int = 0) -> torch.Tensor:
+    """Clean a uint8 BHW batch with tensor ops on the batch's device.
+
+    Artifact removal needs connected-component labeling, so that single
+    step is run per frame with OpenCV on a thread pool.
+    """
+    mask = (gray > params.threshold_value).to(torch.float32).unsqueeze(1)
+
+    k = params.kernel_size
+    if k > 1:
+        mask = _erode(_dilate(mask, k), k)  # close
+        mask = _dilate(_erode(mask, k), k)  # open
+
+    binary = mask.squeeze(1).to(torch.uint8).mul_(255)
+
+    if params.remove_artifacts:
+        frames = np.ascontiguousarray(binary.cpu().numpy())
+        cleaned = map_frames(
+            lambda frame: remove_specks(frame, params.min_area, params.fill_holes),
+            frames, num_workers)
+        binary = torch.from_numpy(cleaned).to(gray.device)
+
+    if params.smooth_lines:
+        mask = (binary > 0).to(torch.float32).unsqueeze(1)
+        binary = _smooth(mask).squeeze(1).to(torch.uint8).mul_(255)
+
+    if params.auto_contrast:
+        binary = equalize_hist(binary)
+
+    return binary
+
+def cleanup_batch(image: torch.Tensor, params: CleanupParams, backend: str = "auto",
+                  num_workers: int = 0, device: Optional[torch.device] = None) -> torch.Tensor:
+    """Clean a batch of line art images in a single call.
+
+    Args:
+        image: Image tensor in BHWC, BCHW, HWC, CHW or HW layout.
+        params: Cleanup parameters.
+        backend: ``"torch"``, ``"opencv"`` or ``"auto"`` (torch on GPU inputs,
+            OpenCV otherwise).
+        num_workers: Thread pool size for per-frame work, 0 for one per CPU.
+        device: Device for the torch backend, defaults to the input's device.
+
+    Returns:
+        Float32 BCHW RGB tensor on the device the work ran on.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown cleanup backend '{backend}'")
+
+    if device is not None:
+        image = image.to(device)
+    if backend == "auto":
+        backend = "torch" if image.is_cuda else "opencv"
+
+    image = to_bhwc(image)
+    if backend == "opencv":
+        return cleanup_batch_opencv(image, params, num_workers)
+
+    gray = rgb_to_gray(quantize_uint8(image))
+    return gray_to_tensor(cleanup_batch_torch(gray, params, num_workers))
+
+def benchmark_cleanup(frames: int = 48, size: int = 512, repeats: int = 3,
+                      num_workers: int = 0) -> Dict[str, float]:
+    """Measure cleanup throughput of the batched backends against per-frame calls.
+
+    The per-frame figure runs one ``cleanup_batch`` call per frame, the way
+    the node ran before it accepted batches. Inputs are synthetic line art:
+    random strokes with speckle noise.
+
+    Returns:
+        Dict of frames per second keyed by ``per_frame``, ``opencv`` and
+        ``torch`` (best of ``repeats`` runs each).
+    """
+    import time
+    
+    generator = torch.Generator().manual_seed(0)
+    image = torch.ones((frames, size, size, 3))
+    for _ in range(32):
+        row, col = torch.randint(0, size - 8, (2,), generator=generator).tolist()
+        image[:, row:row + 4, col:] = 0.0
+    image[torch.rand((frames, size, size), generator=generator) < 0.002] = 0.0
+    params = CleanupParams()
+    
+    def best_fps(run) -> float:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - start)
+        return frames / best
+    
+    return {
+        "per_frame": best_fps(lambda: [cleanup_batch(image[i:i + 1], params, "opencv", 1)
+                                       for i in range(frames)]),
+        "opencv": best_fps(lambda: cleanup_batch(image, params, "opencv", num_workers)),
+        "torch": best_fps(lambda: cleanup_batch(image, params, "torch", num_workers)),
+    }
+
+if __name__ == "__main__":
+    print(f"CPU workers: {resolve_workers()}")
+    for name, fps in benchmark_cleanup().items():
+        print(f"{name}: {fps:.0f} frames/s")
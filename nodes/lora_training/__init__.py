@@ -2,8 +2,13 @@
 LoRA training nodes for Sidekick.
 """
 
-from .trainer import LoRATrainerNode
-from .dataset import DatasetPreparationNode
-from .config import LoRAConfigNode
+from ..registry import lazy_exports
+
+# Node modules are imported when their class is first accessed
+__getattr__ = lazy_exports(__name__, {
+    "LoRATrainerNode": ".trainer",
+    "DatasetPreparationNode": ".dataset",
+    "LoRAConfigNode": ".config",
+})
 
 __all__ = ["LoRATrainerNode", "DatasetPreparationNode", "LoRAConfigNode"]
@@ -0,0 +1,126 @@
+"""
+Aspect-ratio bucketing for LoRA training.
+
+Instead of squashing every image to one square size, images are assigned
+to the bucket (a resolution with roughly the target pixel count) whose
+aspect ratio is closest to their own, letterboxed into it, and batched
+only with images of the same bucket.
+"""
+
+import math
+import os
+import torch
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+from .loader import DatasetItem
+
+Bucket = Tuple[int, int]  # (height, width)
+
+def make_buckets(resolution: int, step: int = 64, max_aspect: float = 2.0) -> List[Bucket]:
+    """Bucket sizes with at most ``resolution``² pixels and sides divisible by ``step``.
+
+    Buckets are sorted from tallest to widest.
+    """
+    area = resolution * resolution
+    buckets = set()
+    for width in range(step, int(resolution * max_aspect) + 1, step):
+        height = (area // width) // step * step
+        if height >= step and max(height / width, width / height) <= max_aspect:
+            buckets.add((height, width))
+    return sorted(buckets, key=lambda bucket: bucket[1] / bucket[0])
+
+def read_image_size(path: str) -> Tuple[int, int]:
+    """Read an image's (height, width) from its header, respecting EXIF rotation."""
+    from PIL import Image
+
+    with Image.open(path) as image:
+        width, height = image.size
+        # Orientations 5-8 are rotated by 90 degrees when decoded
+        if image.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            width, height = height, width
+    return height, width
+
+def padded_fraction(size: Tuple[int, int], bucket: Bucket) -> float:
+    """Share of a bucket left as padding when an image is fitted inside it."""
+    height, width = size
+    scale = min(bucket[0] / height, bucket[1] / width)
+    fitted = min(bucket[0], round(height * scale)) * min(bucket[1], round(width * scale))
+    return 1.0 - fitted / (bucket[0] * bucket[1])
+
+def closest_bucket(size: Tuple[int, int], buckets: Sequence[Bucket]) -> int:
+    """Index of the bucket with the nearest aspect ratio (least padding)."""
+    aspect = math.log(size[1] / size[0])
+    return min(range(len(buckets)), key=lambda i: abs(math.log(buckets[i][1] / buckets[i][0]) - aspect))
+
+@dataclass
+class BucketIndex:
+    """Bucket assignment of every image of a dataset."""
+
+    buckets: List[Bucket]
+    sizes: List[Tuple[int, int]]
+    assignments: List[int]
+
+    def members(self) -> Dict[int, List[int]]:
+        """Item indices of every non-empty bucket."""
+        groups: Dict[int, List[int]] = {}
+        for item_index, bucket in enumerate(self.assignments):
+            groups.setdefault(bucket, []).append(item_index)
+        return groups
+
+    def bucket_of(self, item_index: int) -> Bucket:
+        return self.buckets[self.assignments[item_index]]
+
+    def padded_fraction(self) -> float:
+        """Padded share of all pixels fed to the model."""
+        padded = total = 0.0
+        for size, bucket_index in zip(self.sizes, self.assignments):
+            bucket = self.buckets[bucket_index]
+            pixels = bucket[0] * bucket[1]
+            padded += padded_fraction(size, bucket) * pixels
+            total += pixels
+        return padded / total if total else 0.0
+
+    def batches(self, batch_size: int, epoch: int = 0, shuffle: bool = True, seed: int = 0,
+                drop_last: bool = False) -> List[Tuple[int, int, List[int]]]:
+        """``(height, width, item indices)`` of every batch of an epoch.
+
+        Images are shuffled within their bucket and batched there, so a
+        batch never mixes sizes; the batch order is then shuffled across
+        buckets. Each bucket contributes at most one incomplete batch.
+        """
+        generator = torch.Generator().manual_seed(seed + epoch)
+        batches = []
+        for bucket_index, members in sorted(self.members().items()):
+            if shuffle:
+                members = [members[i] for i in torch.randperm(len(members), generator=generator).tolist()]
+            height, width = self.buckets[bucket_index]
+            for start in range(0, len(members), batch_size):
+                chunk = members[start:start + batch_size]
+                if drop_last and len(chunk) < batch_size:
+                    continue
+                batches.append((height, width, chunk))
+        if shuffle:
+            batches = [batches[i] for i in torch.randperm(len(batches), generator=generator).tolist()]
+        return batches
+
+    def summary(self, resolution: int) -> str:
+        """Bucket usage and padding compared with one square size."""
+        square = [(resolution, resolution)]
+        baseline = BucketIndex(square, self.sizes, [0] * len(self.sizes)).padded_fraction()
+        text = f"- Buckets Used: {len(self.members())} of {len(self.buckets)}\n"
+        for bucket_index, members in sorted(self.members().items()):
+            height, width = self.buckets[bucket_index]
+            text += f"  - {width}x{height}: {len(members)} images\n"
+        text += f"- Padded Pixels: {self.padded_fraction():.1%} (single {resolution}x{resolution} size: {baseline:.1%})\n"
+        return text
+
+def build_bucket_index(items: Sequence[DatasetItem], resolution: int, step: int = 64,
+                       max_aspect: float = 2.0, num_workers: int = 0) -> BucketIndex:
+    """Read every image size from its header and assign it to a bucket."""
+    buckets = make_buckets(resolution, step, max_aspect)
+    workers = num_workers if num_workers > 0 else (os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        sizes = list(pool.map(read_image_size, [item.path for item in items]))
+    assignments = [closest_bucket(size, buckets) for size in sizes]
+    return BucketIndex(buckets, sizes, assignments)
@@ -0,0 +1,253 @@
+"""
+Preprocessed dataset cache for LoRA training.
+
+A dataset is decoded and resized once into memory-mappable ``.npy``
+shards; a JSON manifest maps every source file (with its mtime and size)
+to a row of a shard and records the preprocessing parameters. Later runs
+read rows straight from ``np.memmap`` views, and only files that were
+added or changed since the last build are decoded again.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from typing import Any, Dict, List, Sequence
+from ...config.paths import ensure_directory, get_temp_path
+from .loader import DatasetItem, decode_image, decode_process_pool
+
+CACHE_VERSION = 1
+CACHE_DTYPES = ("uint8", "float16")
+
+# Shards are compacted once this share of their rows is stale
+COMPACT_THRESHOLD = 0.5
+
+def get_dataset_cache_dir(dataset_path: str, height: int, width: int, dtype: str = "uint8",
+                          fit: str = "crop") -> str:
+    """Cache directory of a dataset and preprocessing settings under the temp path."""
+    key = f"{os.path.abspath(dataset_path)}|{height}x{width}|{dtype}|{fit}"
+    digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+    name = os.path.basename(os.path.normpath(dataset_path)) or "dataset"
+    return os.path.join(get_temp_path(), "dataset_cache", f"{name}_{digest}")
+
+def _decode_row(path: str, height: int, width: int, dtype: str, fit: str) -> np.ndarray:
+    image = decode_image(path, height, width, fit)
+    if dtype == "float16":
+        return (image.astype(np.float32) / 255.0).astype(np.float16)
+    return image
+
+class DatasetCache:
+    """Memory-mapped shards of preprocessed dataset images.
+
+    Args:
+        cache_dir: Directory holding the manifest and shards.
+        height: Preprocessed image height.
+        width: Preprocessed image width.
+        dtype: ``"uint8"`` (exact, compact) or ``"float16"`` ([0, 1] floats).
+        fit: How images are fitted to the size, ``"crop"`` or ``"pad"``.
+    """
+
+    def __init__(self, cache_dir: str, height: int, width: int, dtype: str = "uint8",
+                 fit: str = "crop"):
+        if dtype not in CACHE_DTYPES:
+            raise ValueError(f"Unsupported cache dtype '{dtype}', expected one of {list(CACHE_DTYPES)}")
+        self.cache_dir = ensure_directory(cache_dir)
+        self.params = {"version": CACHE_VERSION, "height": height, "width": width, "dtype": dtype,
+                       "fit": fit}
+        self.entries: Dict[str, Dict[str, int]] = {}
+        self.shards: List[str] = []
+        self.decoded = 0
+        self.reused = 0
+        self._views: Dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._load_manifest()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.cache_dir, "manifest.json")
+
+    @property
+    def dtype(self) -> str:
+        return self.params["dtype"]
+
+    def build(self, items: Sequence[DatasetItem], num_workers: int = 0) -> "DatasetCache":
+        """Bring the cache up to date with a dataset index.
+
+        Unchanged files (same path, mtime and size) are reused; new and
+        modified files are decoded in a process pool into one new shard.
+        Shards are rewritten without decoding when too many rows are stale.
+        """
+        stale = [item for item in items if not self._is_current(item)]
+        self.reused = len(items) - len(stale)
+        self.decoded = len(stale)
+
+        live = {item.path for item in items}
+        self.entries = {path: entry for path, entry in self.entries.items() if path in live}
+        if stale:
+            self._write_shard(stale, num_workers)
+        if self._stale_fraction() > COMPACT_THRESHOLD:
+            self._compact()
+        self._save_manifest()
+        return self
+
+    def read(self, path: str) -> np.ndarray:
+        """Memory-mapped HWC row of a cached file."""
+        entry = self.entries.get(path)
+        if entry is None:
+            raise KeyError(f"'{path}' is not in the dataset cache")
+        return self._shard_view(entry["shard"])[entry["row"]]
+
+    def summary(self) -> str:
+        text = f"- Dataset Cache: {len(self.entries)} images in {len(self.shards)} shards ({self.dtype})\n"
+        text += f"- Cache Build: {self.reused} reused, {self.decoded} decoded\n"
+        return text
+
+    def _is_current(self, item: DatasetItem) -> bool:
+        entry = self.entries.get(item.path)
+        return (entry is not None and entry["mtime_ns"] == item.mtime_ns
+                and entry["size"] == item.size)
+
+    def _shard_view(self, shard: int) -> np.ndarray:
+        view = self._views.get(shard)
+        if view is None:
+            with self._lock:
+                view = self._views.get(shard)
+                if view is None:
+                    view = np.load(os.path.join(self.cache_dir, self.shards[shard]), mmap_mode='r')
+                    self._views[shard] = view
+        return view
+
+    def _write_shard(self, items: Sequence[DatasetItem], num_workers: int) -> None:
+        """Decode items into a new shard and point their entries at it."""
+        height, width, dtype = self.params["height"], self.params["width"], self.dtype
+        fit = self.params["fit"]
+        index = len(self.shards)
+        name = self._new_shard_name()
+        temp_path = os.path.join(self.cache_dir, name + ".tmp")
+        shard = np.lib.format.open_memmap(temp_path, mode='w+', dtype=dtype,
+                                           shape=(len(items), height, width, 3))
+
+        paths = [item.path for item in items]
+        workers = num_workers if num_workers > 0 else (os.cpu_count() or 1)
+        with decode_process_pool(workers) as pool:
+            rows = pool.map(_decode_row, paths, [height] * len(paths), [width] * len(paths),
+                            [dtype] * len(paths), [fit] * len(paths), chunksize=16)
+            for row, image in enumerate(rows):
+                shard[row] = image
+        shard.flush()
+        del shard
+        os.replace(temp_path, os.path.join(self.cache_dir, name))
+
+        self.shards.append(name)
+        for row, item in enumerate(items):
+            self.entries[item.path] = {"mtime_ns": item.mtime_ns, "size": item.size,
+                                       "shard": index, "row": row}
+
+    @staticmethod
+    def _new_shard_name() -> str:
+        # Never reuse the name of a shard that may still be referenced
+        return f"shard_{os.getpid()}_{os.urandom(6).hex()}.npy"
+
+    def _stale_fraction(self) -> float:
+        total = sum(len(self._shard_view(i)) for i in range(len(self.shards)))
+        return 1.0 - len(self.entries) / total if total else 0.0
+
+    def _compact(self) -> None:
+        """Copy live rows into a single new shard and drop the old ones."""
+        height, width = self.params["height"], self.params["width"]
+        name = self._new_shard_name()
+        temp_path = os.path.join(self.cache_dir, name + ".tmp")
+        paths = sorted(self.entries)
+        shard = np.lib.format.open_memmap(temp_path, mode='w+', dtype=self.dtype,
+                                           shape=(len(paths), height, width, 3))
+        for row, path in enumerate(paths):
+            shard[row] = self.read(path)
+        shard.flush()
+        del shard
+        os.replace(temp_path, os.path.join(self.cache_dir, name))
+
+        old_shards = self.shards
+        self._views.clear()
+        self.shards = [name]
+        for row, path in enumerate(paths):
+            self.entries[path]["shard"] = 0
+            self.entries[path]["row"] = row
+        self._save_manifest()
+        for old in old_shards:
+            try:
+                os.remove(os.path.join(self.cache_dir, old))
+            except OSError:
+                pass
+
+    def _load_manifest(self) -> None:
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        # Different preprocessing means nothing can be reused
+        if manifest.get("params") != self.params:
+            return
+        shards = manifest.get("shards", [])
+        if not all(os.path.exists(os.path.join(self.cache_dir, name)) for name in shards):
+            return
+        self.shards = shards
+        self.entries = manifest.get("entries", {})
+
+    def _save_manifest(self) -> None:
+        manifest: Dict[str, Any] = {"params": self.params, "shards": self.shards, "entries": self.entries}
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.manifest_path)
+
+class BucketedDatasetCache:
+    """One ``DatasetCache`` per aspect-ratio bucket of a dataset.
+
+    Every image is cached letterboxed at the size of its bucket, and
+    ``read`` routes each path to the cache of its bucket.
+
+    Args:
+        dataset_path: Dataset directory, used to name the cache directories.
+        bucket_index: ``BucketIndex`` over the dataset items.
+        dtype: Storage dtype of every bucket cache.
+    """
+
+    def __init__(self, dataset_path: str, bucket_index, dtype: str = "uint8"):
+        self.dataset_path = dataset_path
+        self.bucket_index = bucket_index
+        self.caches: Dict[int, DatasetCache] = {}
+        self._routes: Dict[str, DatasetCache] = {}
+        self._dtype = dtype
+
+    @property
+    def dtype(self) -> str:
+        return self._dtype
+
+    def build(self, items: Sequence[DatasetItem], num_workers: int = 0) -> "BucketedDatasetCache":
+        """Build the cache of every bucket that has images."""
+        for bucket, members in sorted(self.bucket_index.members().items()):
+            height, width = self.bucket_index.buckets[bucket]
+            cache_dir = get_dataset_cache_dir(self.dataset_path, height, width, self._dtype, "pad")
+            cache = DatasetCache(cache_dir, height, width, self._dtype, "pad")
+            cache.build([items[i] for i in members], num_workers)
+            self.caches[bucket] = cache
+            for i in members:
+                self._routes[items[i].path] = cache
+        return self
+
+    def read(self, path: str) -> np.ndarray:
+        cache = self._routes.get(path)
+        if cache is None:
+            raise KeyError(f"'{path}' is not in the dataset cache")
+        return cache.read(path)
+
+    def summary(self) -> str:
+        images = sum(len(cache.entries) for cache in self.caches.values())
+        shards = sum(len(cache.shards) for cache in self.caches.values())
+        reused = sum(cache.reused for cache in self.caches.values())
+        decoded = sum(cache.decoded for cache in self.caches.values())
+        text = f"- Dataset Cache: {images} images in {shards} shards over {len(self.caches)} buckets ({self.dtype})\n"
+        text += f"- Cache Build: {reused} reused, {decoded} decoded\n"
+        return text
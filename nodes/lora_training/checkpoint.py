@@ -0,0 +1,209 @@
+"""
+Asynchronous, resumable checkpoints of LoRA training.
+
+Saving only snapshots the adapter weights, optimizer state and loop
+counters to CPU tensors on the training thread; a background thread
+writes the snapshot as a flat tensor file, then prunes old checkpoints.
+The adapter weights use the same keys as a finished LoRA file, so any
+checkpoint can also be loaded as a LoRA.
+"""
+
+import json
+import os
+import queue
+import re
+import threading
+import time
+import torch
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from ...utils.tensor_io import load_tensors, read_header, save_tensors
+
+CHECKPOINT_EXTENSION = ".safetensors"
+CHECKPOINT_FORMAT = "sidekick.lora_checkpoint.v1"
+OPTIMIZER_PREFIX = "optimizer.state."
+GENERATOR_KEY = "engine.generator"
+
+def checkpoint_filename(name: str, epoch: int) -> str:
+    return f"{name}_epoch{epoch:04d}{CHECKPOINT_EXTENSION}"
+
+def list_checkpoints(directory: str, name: str) -> List[Tuple[int, str]]:
+    """``(epoch, path)`` of every checkpoint of a run, oldest first."""
+    pattern = re.compile(re.escape(name) + r"_epoch(\d+)" + re.escape(CHECKPOINT_EXTENSION) + "$")
+    found = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                match = pattern.match(entry.name)
+                if match:
+                    found.append((int(match.group(1)), entry.path))
+    except FileNotFoundError:
+        pass
+    return sorted(found)
+
+def snapshot_training_state(engine) -> Tuple[Dict[str, torch.Tensor], Dict[str, str]]:
+    """Copy everything needed to resume an engine into CPU tensors and metadata."""
+    tensors = engine.network.lora_state_dict()
+    optimizer_state = engine.optimizer.state_dict()
+    scalars = {}
+    for index, state in optimizer_state["state"].items():
+        for key, value in state.items():
+            if isinstance(value, torch.Tensor):
+                tensors[f"{OPTIMIZER_PREFIX}{index}.{key}"] = value.detach().to("cpu", copy=True)
+            else:
+                scalars.setdefault(str(index), {})[key] = value
+    tensors[GENERATOR_KEY] = engine.generator.get_state()
+
+    stats = engine.stats
+    metadata = {
+        "format": CHECKPOINT_FORMAT,
+        "epoch": str(engine.epoch),
+        "rank": str(engine.network.rank),
+        "alpha": str(engine.network.alpha),
+        "param_groups": json.dumps(optimizer_state["param_groups"]),
+        "optimizer_scalars": json.dumps(scalars),
+        "scaler": json.dumps(engine.scaler.state_dict()),
+        "stats": json.dumps({"optimizer_steps": stats.optimizer_steps, "images": stats.images,
+                             "epoch_losses": stats.epoch_losses}),
+    }
+    return tensors, metadata
+
+def restore_training_state(engine, path: str) -> int:
+    """Load a checkpoint into an engine and return its epoch."""
+    tensors, metadata = load_tensors(path)
+    if metadata.get("format") != CHECKPOINT_FORMAT:
+        raise ValueError(f"'{path}' is not a LoRA training checkpoint")
+    if int(metadata["rank"]) != engine.network.rank or float(metadata["alpha"]) != engine.network.alpha:
+        raise ValueError(f"Checkpoint '{path}' was trained with rank {metadata['rank']} and "
+                         f"alpha {metadata['alpha']}, not rank {engine.network.rank} and alpha {engine.network.alpha}")
+    engine.network.load_lora_state_dict(tensors)
+
+    state: Dict[int, Dict[str, object]] = {}
+    for key, tensor in tensors.items():
+        if key.startswith(OPTIMIZER_PREFIX):
+            index, name = key[len(OPTIMIZER_PREFIX):].split(".", 1)
+            state.setdefault(int(index), {})[name] = tensor
+    for index, values in json.loads(metadata["optimizer_scalars"]).items():
+        state.setdefault(int(index), {}).update(values)
+    engine.optimizer.load_state_dict({"state": state, "param_groups": json.loads(metadata["param_groups"])})
+
+    scaler_state = json.loads(metadata["scaler"])
+    if scaler_state:
+        engine.scaler.load_state_dict(scaler_state)
+    engine.generator.set_state(tensors[GENERATOR_KEY].clone())
+    stats = json.loads(metadata["stats"])
+    engine.stats.optimizer_steps = stats["optimizer_steps"]
+    engine.stats.images = stats["images"]
+    engine.stats.epoch_losses = list(stats["epoch_losses"])
+    engine.epoch = int(metadata["epoch"])
+    return engine.epoch
+
+def find_latest_checkpoint(directory: str, name: str) -> Optional[str]:
+    """Newest checkpoint of a run whose file is complete."""
+    for _, path in reversed(list_checkpoints(directory, name)):
+        try:
+            entries, metadata, data_start = read_header(path)
+        except (OSError, ValueError):
+            continue
+        end = max((entry["data_offsets"][1] for entry in entries.values()), default=0)
+        if metadata.get("format") == CHECKPOINT_FORMAT and data_start + end == os.path.getsize(path):
+            return path
+    return None
+
+@dataclass
+class SaveRecord:
+    """Cost of one checkpoint save."""
+
+    epoch: int
+    path: str
+    stall: float = 0.0
+    write_time: float = 0.0
+    nbytes: int = 0
+
+_STOP = object()
+
+class CheckpointWriter:
+    """Write training checkpoints on a background thread.
+
+    ``save`` blocks the training loop only for the CPU snapshot, plus any
+    wait for the previous write when ``max_pending`` writes are queued.
+
+    Args:
+        directory: Directory of the checkpoints.
+        name: Run name used as the file name prefix.
+        keep_last: Number of newest checkpoints to keep.
+        max_pending: Snapshots that may wait to be written.
+    """
+
+    def __init__(self, directory: str, name: str, keep_last: int = 3, max_pending: int = 1):
+        self.directory = directory
+        self.name = name
+        self.keep_last = max(1, keep_last)
+        self.records: List[SaveRecord] = []
+        self._queue = queue.Queue(maxsize=max(1, max_pending))
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="sidekick-checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def save(self, engine) -> SaveRecord:
+        """Snapshot an engine and queue the checkpoint for writing."""
+        self._raise_error()
+        start = time.perf_counter()
+        tensors, metadata = snapshot_training_state(engine)
+        path = os.path.join(self.directory, checkpoint_filename(self.name, engine.epoch))
+        record = SaveRecord(engine.epoch, path)
+        self._queue.put((record, tensors, metadata))
+        record.stall = time.perf_counter() - start
+        self.records.append(record)
+        return record
+
+    def close(self) -> None:
+        """Finish every queued write."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._raise_error()
+
+    def __enter__(self) -> "CheckpointWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def summary(self) -> str:
+        if not self.records:
+            return ""
+        stalls = [record.stall * 1000 for record in self.records]
+        writes = [record.write_time * 1000 for record in self.records]
+        text = f"- Checkpoints: {len(self.records)} saved, last {self.keep_last} kept "
+        text += f"({self.records[-1].nbytes / 2**20:.1f} MB each)\n"
+        text += f"- Save Stall: {sum(stalls) / len(stalls):.1f} ms mean, {max(stalls):.1f} ms max "
+        text += f"(background write {sum(writes) / len(writes):.1f} ms mean)\n"
+        return text
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                return
+            record, tensors, metadata = job
+            if self._error is not None:
+                continue
+            try:
+                start = time.perf_counter()
+                record.nbytes = save_tensors(record.path, tensors, metadata)
+                record.write_time = time.perf_counter() - start
+                self._prune()
+            except BaseException as e:
+                self._error = e
+
+    def _prune(self) -> None:
+        for _, path in list_checkpoints(self.directory, self.name)[:-self.keep_last]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Checkpoint write failed: {self._error}") from self._error
@@ -0,0 +1,219 @@
+"""
+Training loop for LoRA adapters.
+
+The base model is frozen and only the adapters of a ``LoRANetwork`` are
+optimized, under autocast, with optional gradient accumulation. The
+objective is denoising: a batch (or its VAE latents) is noised at a random
+level and the model is trained to recover the clean sample.
+"""
+
+import math
+import time
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+from .lora import LoRANetwork
+
+MIXED_PRECISION = ["bf16", "fp16", "no"]
+
+def _peak_host_memory() -> int:
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _grad_scaler(device_type: str, enabled: bool):
+    # The device-generic torch.amp.GradScaler was added in torch 2.3
+    if hasattr(torch.amp, "GradScaler"):
+        return torch.amp.GradScaler(device_type, enabled=enabled)
+    return torch.cuda.amp.GradScaler(enabled=enabled)
+
+@dataclass
+class TrainingStats:
+    """Step timing, loss and memory of a training run."""
+
+    optimizer_steps: int = 0
+    images: int = 0
+    step_times: List[float] = field(default_factory=list)
+    epoch_losses: List[float] = field(default_factory=list)
+    trainable_parameters: int = 0
+    adapter_bytes: int = 0
+    peak_memory: int = 0
+    device: str = "cpu"
+
+    @property
+    def mean_step_time(self) -> float:
+        return sum(self.step_times) / len(self.step_times) if self.step_times else 0.0
+
+    def summary(self) -> str:
+        text = f"- Trainable Parameters: {self.trainable_parameters:,}\n"
+        # Weights, gradients and two AdamW moments per parameter
+        text += f"- Adapter Memory: {self.adapter_bytes * 4 / 2**20:.1f} MB with gradients and optimizer state\n"
+        label = "Peak GPU Memory" if self.device == "cuda" else "Peak Process Memory"
+        text += f"- {label}: {self.peak_memory / 2**20:.0f} MB\n"
+        text += f"- Optimizer Steps: {self.optimizer_steps} ({self.images} images)\n"
+        if self.step_times:
+            text += f"- Step Time: {self.mean_step_time * 1000:.1f} ms mean, {max(self.step_times) * 1000:.1f} ms max\n"
+        if self.epoch_losses:
+            text += f"- Loss: {self.epoch_losses[0]:.5f} (first epoch) -> {self.epoch_losses[-1]:.5f} (last epoch)\n"
+        return text
+
+class DenoisingObjective:
+    """Denoising loss of a base model on a batch of training images.
+
+    ComfyUI models (``ModelPatcher``) are called through ``apply_model``
+    with noise levels from their own ``model_sampling``, so the loss is the
+    model's usual prediction objective; a plain ``nn.Module`` is trained
+    to map a noised batch back to the clean one.
+
+    Args:
+        base_model: ComfyUI ``MODEL`` or ``nn.Module``.
+        vae: Optional ComfyUI ``VAE`` encoding images to latents first.
+        conditioning: Optional ComfyUI ``CONDITIONING`` used as the
+            cross-attention context of every step.
+    """
+
+    def __init__(self, base_model, vae=None, conditioning=None):
+        inner = getattr(base_model, "model", None)
+        if inner is not None and hasattr(inner, "apply_model"):
+            self.comfy_model = inner
+            self.module = inner.diffusion_model
+        elif isinstance(base_model, nn.Module):
+            self.comfy_model = None
+            self.module = base_model
+        else:
+            raise ValueError(f"Cannot train adapters for a model of type {type(base_model).__name__}")
+        self.vae = vae
+        self.context = conditioning[0][0] if conditioning else None
+        self.device = next(self.module.parameters()).device
+
+    def prepare(self, batch: torch.Tensor) -> torch.Tensor:
+        """Turn a uint8 or [0, 1] float BHWC batch into model inputs."""
+        pixels = batch.to(self.device, non_blocking=True)
+        pixels = pixels.float() / 255.0 if pixels.dtype == torch.uint8 else pixels.float()
+        if self.vae is not None:
+            with torch.no_grad():
+                return self.vae.encode(pixels[..., :3]).to(self.device)
+        return pixels.permute(0, 3, 1, 2) * 2.0 - 1.0
+
+    def __call__(self, clean: torch.Tensor, generator: torch.Generator) -> torch.Tensor:
+        noise = torch.randn(clean.shape, generator=generator, device=clean.device)
+        levels = torch.rand((clean.shape[0],), generator=generator, device=clean.device)
+        shape = (-1,) + (1,) * (clean.dim() - 1)
+
+        if self.comfy_model is None:
+            noisy = clean + noise * levels.view(shape)
+            return F.mse_loss(self.module(noisy).float(), clean)
+
+        sampling = self.comfy_model.model_sampling
+        sigmas = sampling.sigma(levels * 999.0).to(clean.device)
+        noisy = clean + noise * sigmas.view(shape)
+        context = None
+        if self.context is not None:
+            context = self.context.to(clean.device).expand(clean.shape[0], -1, -1)
+        denoised = self.comfy_model.apply_model(noisy, sigmas, c_crossattn=context).float()
+        # Dividing by sigma² weights every level like a noise-prediction loss
+        error = ((denoised - clean) ** 2).flatten(1).mean(dim=1)
+        return (error / sigmas.float().clamp(min=1e-3) ** 2).mean()
+
+class LoRATrainingEngine:
+    """Optimizes the adapters of a ``LoRANetwork``.
+
+    Args:
+        network: Adapters attached to ``objective.module``.
+        objective: Loss of a prepared batch.
+        learning_rate: AdamW learning rate.
+        gradient_accumulation: Batches per optimizer step.
+        mixed_precision: ``"bf16"``, ``"fp16"`` or ``"no"`` autocast.
+        seed: Seed of the noise drawn by the objective.
+    """
+
+    def __init__(self, network: LoRANetwork, objective: DenoisingObjective, learning_rate: float,
+                 gradient_accumulation: int = 1, mixed_precision: str = "bf16", seed: int = 0):
+        if mixed_precision not in MIXED_PRECISION:
+            raise ValueError(f"Unsupported mixed precision '{mixed_precision}', expected one of {MIXED_PRECISION}")
+        self.network = network
+        self.objective = objective
+        self.gradient_accumulation = max(1, gradient_accumulation)
+        self.device = objective.device
+        self.optimizer = torch.optim.AdamW(network.trainable_parameters(), lr=learning_rate)
+        # fp16 autocast is only worthwhile on CUDA, where it needs loss scaling
+        if mixed_precision == "fp16" and self.device.type != "cuda":
+            mixed_precision = "bf16"
+        self.autocast_dtype = {"bf16": torch.bfloat16, "fp16": torch.float16}.get(mixed_precision)
+        self.scaler = _grad_scaler(self.device.type, mixed_precision == "fp16")
+        self.generator = torch.Generator(device=self.device).manual_seed(seed)
+        self.epoch = 0
+
+        parameters = network.trainable_parameters()
+        self.stats = TrainingStats(
+            trainable_parameters=sum(p.numel() for p in parameters),
+            adapter_bytes=sum(p.numel() * p.element_size() for p in parameters),
+            device=self.device.type,
+        )
+
+    def train(self, loader, epochs: int, save_every: int = 0,
+              on_save: Optional[Callable[["LoRATrainingEngine"], None]] = None) -> TrainingStats:
+        """Run epochs up to ``epochs``, calling ``on_save`` every ``save_every``
+        epochs and after the last one."""
+        if self.device.type == "cuda":
+            torch.cuda.reset_peak_memory_stats(self.device)
+        self.network.train()
+        while self.epoch < epochs:
+            # A resumed run continues the loader's per-epoch shuffle
+            if hasattr(loader, "epoch"):
+                loader.epoch = self.epoch
+            self.stats.epoch_losses.append(self._train_epoch(loader))
+            self.epoch += 1
+            if on_save is not None and (self.epoch == epochs or (save_every and self.epoch % save_every == 0)):
+                on_save(self)
+        self.network.eval()
+
+        if self.device.type == "cuda":
+            self.stats.peak_memory = torch.cuda.max_memory_allocated(self.device)
+        else:
+            self.stats.peak_memory = _peak_host_memory()
+        return self.stats
+
+    def _train_epoch(self, loader) -> float:
+        total_loss = 0.0
+        batches = 0
+        pending = 0
+        # Step time counts compute only; waiting for data is in the loader stats
+        step_time = 0.0
+        for batch in loader:
+            start = time.perf_counter()
+            clean = self.objective.prepare(batch)
+            with torch.autocast(self.device.type, dtype=self.autocast_dtype or torch.float32,
+                                enabled=self.autocast_dtype is not None):
+                loss = self.objective(clean, self.generator)
+            if not math.isfinite(loss.item()):
+                raise RuntimeError(f"Training diverged at epoch {self.epoch + 1}: loss is {loss.item()}")
+            self.scaler.scale(loss / self.gradient_accumulation).backward()
+            total_loss += loss.item()
+            batches += 1
+            pending += 1
+            self.stats.images += len(batch)
+            step_time += time.perf_counter() - start
+            if pending == self.gradient_accumulation:
+                self._optimizer_step(step_time)
+                pending = 0
+                step_time = 0.0
+        # Apply what is left of an incomplete accumulation
+        if pending:
+            self._optimizer_step(step_time)
+        return total_loss / batches if batches else 0.0
+
+    def _optimizer_step(self, step_time: float) -> None:
+        start = time.perf_counter()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        self.optimizer.zero_grad(set_to_none=True)
+        if self.device.type == "cuda":
+            torch.cuda.synchronize(self.device)
+        self.stats.optimizer_steps += 1
+        self.stats.step_times.append(step_time + time.perf_counter() - start)
@@ -0,0 +1,322 @@
+"""
+Streaming dataset loading for LoRA training.
+
+The dataset directory is scanned once into an index; images are decoded
+and resized in a worker pool while the trainer runs, and finished batches
+wait in a bounded queue (in pinned memory when CUDA is available) so the
+training loop only blocks when decoding falls behind.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+import torch
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+class DatasetItem(NamedTuple):
+    """An indexed dataset image."""
+
+    path: str
+    mtime_ns: int
+    size: int
+
+def scan_dataset(dataset_path: str) -> List[DatasetItem]:
+    """Index every image under ``dataset_path`` with a single directory walk."""
+    if not os.path.isdir(dataset_path):
+        raise ValueError(f"Dataset path '{dataset_path}' is not a directory")
+
+    items = []
+    pending = [dataset_path]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    stat = entry.stat()
+                    items.append(DatasetItem(entry.path, stat.st_mtime_ns, stat.st_size))
+
+    if not items:
+        raise ValueError(f"No images found in '{dataset_path}'")
+    items.sort()
+    return items
+
+FIT_MODES = ("crop", "pad")
+
+def decode_image(path: str, height: int, width: int, fit: str = "crop") -> np.ndarray:
+    """Decode an image to RGB uint8 HWC of exactly ``height`` x ``width``.
+
+    ``"crop"`` resizes the image to cover the target and center-crops it;
+    ``"pad"`` resizes it to fit inside the target and letterboxes it with
+    black borders, keeping the whole image.
+    """
+    if fit not in FIT_MODES:
+        raise ValueError(f"Unsupported fit mode '{fit}', expected one of {list(FIT_MODES)}")
+    image = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not decode image '{path}'")
+
+    source_height, source_width = image.shape[:2]
+    if fit == "pad":
+        scale = min(height / source_height, width / source_width)
+        resized_height = min(height, max(1, round(source_height * scale)))
+        resized_width = min(width, max(1, round(source_width * scale)))
+    else:
+        scale = max(height / source_height, width / source_width)
+        resized_height = max(height, round(source_height * scale))
+        resized_width = max(width, round(source_width * scale))
+    if (resized_height, resized_width) != (source_height, source_width):
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        image = cv2.resize(image, (resized_width, resized_height), interpolation=interpolation)
+
+    if fit == "pad":
+        output = np.zeros((height, width, 3), dtype=np.uint8)
+        top = (height - resized_height) // 2
+        left = (width - resized_width) // 2
+        output[top:top + resized_height, left:left + resized_width] = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return output
+    top = (resized_height - height) // 2
+    left = (resized_width - width) // 2
+    return cv2.cvtColor(image[top:top + height, left:left + width], cv2.COLOR_BGR2RGB)
+
+def _init_decode_worker() -> None:
+    # Parallelism comes from the pool; keep each worker single-threaded
+    cv2.setNumThreads(1)
+
+def decode_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Process pool for decoding whose workers are started with ``spawn``.
+    
+    The trainer runs on a ComfyUI worker thread in a process that holds
+    torch and CUDA state; forked children inherit that state (and locks
+    held by other threads), which can hang them or break CUDA.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_decode_worker,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+@dataclass
+class LoaderStats:
+    """Throughput counters of a data loader."""
+
+    images: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+    wait_time: float = 0.0
+
+    @property
+    def images_per_second(self) -> float:
+        return self.images / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def starvation_fraction(self) -> float:
+        """Share of the consumer's time spent waiting for batches."""
+        return self.wait_time / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        text = f"- Images Loaded: {self.images} in {self.batches} batches\n"
+        text += f"- Loader Throughput: {self.images_per_second:.1f} images/sec\n"
+        text += f"- Starvation: {self.wait_time:.2f}s ({self.starvation_fraction:.1%} of loop time)\n"
+        return text
+
+_END = object()
+
+class StreamingDataLoader:
+    """Iterate a dataset in shuffled batches decoded by a worker pool.
+
+    Each iteration is one epoch. Decoding runs ahead of the consumer by
+    at most ``prefetch_batches`` batches; batches are uint8 BHWC tensors,
+    pinned when CUDA is available so host-to-device copies can be async.
+    With a dataset cache, batches are read from its shards without decoding
+    (and are float16 for a float16 cache). With a bucket index, every
+    batch is drawn from a single bucket and has that bucket's size, so
+    consecutive batches may differ in height and width.
+
+    Args:
+        items: Dataset index from ``scan_dataset``.
+        batch_size: Images per batch.
+        height: Output image height.
+        width: Output image width.
+        num_workers: Decode workers, where 0 means one per CPU.
+        prefetch_batches: Depth of the ready-batch queue.
+        shuffle: Shuffle the order every epoch.
+        seed: Base seed of the per-epoch shuffle.
+        drop_last: Drop the final incomplete batch.
+        use_processes: Decode in a spawned process pool instead of threads.
+            OpenCV releases the GIL while decoding, so threads usually keep
+            up and avoid the pool's start-up cost.
+        cache: Optional built ``DatasetCache``; batches are then copied from
+            its memory-mapped shards instead of being decoded.
+        fit: How images are fitted to the batch size, ``"crop"`` or ``"pad"``.
+        buckets: Optional ``BucketIndex`` over ``items``; overrides
+            ``height`` and ``width`` with per-bucket sizes.
+    """
+
+    def __init__(self, items: Sequence[DatasetItem], batch_size: int, height: int, width: int,
+                 num_workers: int = 0, prefetch_batches: int = 4, shuffle: bool = True,
+                 seed: int = 0, drop_last: bool = False, use_processes: bool = False,
+                 cache=None, fit: str = "crop", buckets=None):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if fit not in FIT_MODES:
+            raise ValueError(f"Unsupported fit mode '{fit}', expected one of {list(FIT_MODES)}")
+        if buckets is not None and len(buckets.assignments) != len(items):
+            raise ValueError("Bucket index does not match the dataset items")
+        self.items = list(items)
+        self.batch_size = batch_size
+        self.height = height
+        self.width = width
+        self.num_workers = num_workers if num_workers > 0 else (os.cpu_count() or 1)
+        self.prefetch_batches = max(1, prefetch_batches)
+        self.shuffle = shuffle
+        self.seed = seed
+        self.drop_last = drop_last
+        self.use_processes = use_processes
+        self.cache = cache
+        self.fit = fit
+        self.buckets = buckets
+        self.pin_memory = torch.cuda.is_available()
+        self.stats = LoaderStats()
+        self.epoch = 0
+        self._executor: Optional[Executor] = None
+
+    def __len__(self) -> int:
+        if self.buckets is not None:
+            return len(self.batch_order(0))
+        if self.drop_last:
+            return len(self.items) // self.batch_size
+        return (len(self.items) + self.batch_size - 1) // self.batch_size
+
+    def batch_order(self, epoch: int) -> List[Tuple[int, int, List[int]]]:
+        """``(height, width, item indices)`` of every batch of an epoch."""
+        if self.buckets is not None:
+            return self.buckets.batches(self.batch_size, epoch, self.shuffle, self.seed, self.drop_last)
+        if self.shuffle:
+            generator = torch.Generator().manual_seed(self.seed + epoch)
+            order = torch.randperm(len(self.items), generator=generator).tolist()
+        else:
+            order = list(range(len(self.items)))
+        batches = [(self.height, self.width, order[i:i + self.batch_size])
+                   for i in range(0, len(order), self.batch_size)]
+        if self.drop_last and batches and len(batches[-1][2]) < self.batch_size:
+            batches.pop()
+        return batches
+
+    def __iter__(self) -> Iterator[torch.Tensor]:
+        batches = self.batch_order(self.epoch)
+        self.epoch += 1
+        ready = queue.Queue(maxsize=self.prefetch_batches)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce, args=(batches, ready, stop),
+                                    name="sidekick-data-loader", daemon=True)
+        producer.start()
+
+        start = time.perf_counter()
+        try:
+            while True:
+                wait_start = time.perf_counter()
+                batch = ready.get()
+                self.stats.wait_time += time.perf_counter() - wait_start
+                if batch is _END:
+                    break
+                if isinstance(batch, BaseException):
+                    raise RuntimeError(f"Data loading failed: {batch}") from batch
+                self.stats.images += len(batch)
+                self.stats.batches += 1
+                yield batch
+        finally:
+            stop.set()
+            # Unblock the producer if it is waiting on a full queue
+            while producer.is_alive():
+                try:
+                    ready.get_nowait()
+                except queue.Empty:
+                    producer.join(timeout=0.05)
+            self.stats.elapsed += time.perf_counter() - start
+
+    def close(self) -> None:
+        """Shut down the decode workers."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self) -> "StreamingDataLoader":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = decode_process_pool(self.num_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.num_workers)
+        return self._executor
+
+    def _produce(self, batches: List[Tuple[int, int, List[int]]], ready: queue.Queue, stop: threading.Event) -> None:
+        if self.cache is not None:
+            self._produce_cached(batches, ready, stop)
+            return
+        try:
+            executor = self._get_executor()
+            # Keep enough decodes in flight to fill the queue, and no more
+            max_in_flight = (self.prefetch_batches + 1) * self.batch_size
+            pending = deque()
+            jobs = ((height, width, item_index) for height, width, batch in batches
+                    for item_index in batch)
+
+            def submit_more():
+                while len(pending) < max_in_flight:
+                    job = next(jobs, None)
+                    if job is None:
+                        return
+                    height, width, item_index = job
+                    path = self.items[item_index].path
+                    pending.append(executor.submit(decode_image, path, height, width, self.fit))
+
+            for height, width, batch in batches:
+                submit_more()
+                output = torch.empty((len(batch), height, width, 3), dtype=torch.uint8,
+                                     pin_memory=self.pin_memory)
+                target = output.numpy()
+                for slot in range(len(batch)):
+                    target[slot] = pending.popleft().result()
+                    submit_more()
+                if not self._put(ready, output, stop):
+                    return
+            self._put(ready, _END, stop)
+        except BaseException as e:
+            self._put(ready, e, stop)
+
+    def _produce_cached(self, batches: List[Tuple[int, int, List[int]]], ready: queue.Queue, stop: threading.Event) -> None:
+        dtype = torch.float16 if self.cache.dtype == "float16" else torch.uint8
+        try:
+            for height, width, batch in batches:
+                output = torch.empty((len(batch), height, width, 3), dtype=dtype,
+                                     pin_memory=self.pin_memory)
+                target = output.numpy()
+                for slot, item_index in enumerate(batch):
+                    target[slot] = self.cache.read(self.items[item_index].path)
+                if not self._put(ready, output, stop):
+                    return
+            self._put(ready, _END, stop)
+        except BaseException as e:
+            self._put(ready, e, stop)
+
+    @staticmethod
+    def _put(ready: queue.Queue, item, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,203 @@
+"""
+Low-rank adapters for LoRA training.
+
+Adapters are attached to a model's ``nn.Linear`` and ``nn.Conv2d`` layers
+with forward hooks that add ``up(down(x)) * alpha / rank`` to each layer's
+output. The base layers stay in place, so their weights and state-dict
+keys are untouched, and ``LoRANetwork.remove`` restores the model exactly.
+"""
+
+import functools
+import itertools
+import math
+import torch
+import torch.nn as nn
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from torch.utils.checkpoint import checkpoint
+
+class LoRALinear(nn.Module):
+    """Rank-``rank`` update of an ``nn.Linear`` layer."""
+
+    def __init__(self, base: nn.Linear, rank: int, alpha: float, dropout: float = 0.0):
+        super().__init__()
+        self.rank = rank
+        self.scale = alpha / rank
+        self.dropout = nn.Dropout(dropout) if dropout > 0 else nn.Identity()
+        self.lora_down = nn.Linear(base.in_features, rank, bias=False)
+        self.lora_up = nn.Linear(rank, base.out_features, bias=False)
+        nn.init.kaiming_uniform_(self.lora_down.weight, a=math.sqrt(5))
+        # A zero up-projection makes the adapted model start out identical
+        nn.init.zeros_(self.lora_up.weight)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.lora_up(self.lora_down(self.dropout(x))) * self.scale
+
+class LoRAConv2d(nn.Module):
+    """Rank-``rank`` update of an ``nn.Conv2d`` layer.
+
+    The down-projection has the base layer's kernel, stride and padding;
+    the up-projection is a 1x1 convolution.
+    """
+
+    def __init__(self, base: nn.Conv2d, rank: int, alpha: float, dropout: float = 0.0):
+        super().__init__()
+        self.rank = rank
+        self.scale = alpha / rank
+        self.dropout = nn.Dropout(dropout) if dropout > 0 else nn.Identity()
+        self.lora_down = nn.Conv2d(base.in_channels, rank, base.kernel_size, base.stride,
+                                   base.padding, base.dilation, bias=False)
+        self.lora_up = nn.Conv2d(rank, base.out_channels, 1, bias=False)
+        nn.init.kaiming_uniform_(self.lora_down.weight, a=math.sqrt(5))
+        nn.init.zeros_(self.lora_up.weight)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.lora_up(self.lora_down(self.dropout(x))) * self.scale
+
+def _adapter_hook(adapter: nn.Module, module: nn.Module, inputs: Tuple, output: torch.Tensor) -> torch.Tensor:
+    # Adapters keep float32 weights even when the base model is half precision
+    delta = adapter(inputs[0].to(adapter.lora_down.weight.dtype))
+    return output + delta.to(output.dtype)
+
+def _supports_adapter(module: nn.Module, include_conv: bool) -> bool:
+    if isinstance(module, nn.Linear):
+        return True
+    # Grouped and non-zero-padded convolutions have no plain low-rank form
+    return (include_conv and isinstance(module, nn.Conv2d) and module.groups == 1
+            and module.padding_mode == "zeros")
+
+class LoRANetwork(nn.Module):
+    """The adapters attached to one model.
+
+    Args:
+        model: Model to adapt; its own parameters are frozen.
+        rank: Rank of every adapter.
+        alpha: Scale numerator, so updates are multiplied by ``alpha / rank``.
+        dropout: Dropout applied to adapter inputs while training.
+        include_conv: Also adapt ``nn.Conv2d`` layers.
+    """
+
+    def __init__(self, model: nn.Module, rank: int, alpha: float, dropout: float = 0.0,
+                 include_conv: bool = True):
+        super().__init__()
+        if rank < 1:
+            raise ValueError("LoRA rank must be at least 1")
+        self.rank = rank
+        self.alpha = alpha
+        self.adapters = nn.ModuleDict()
+        self.layer_names: Dict[str, str] = {}
+        self._model = [model]  # not registered, so it is not part of this module
+        self._handles = []
+        self._requires_grad = {name: p.requires_grad for name, p in model.named_parameters()}
+
+        targets = [(name, module) for name, module in model.named_modules()
+                   if name and _supports_adapter(module, include_conv)]
+        if not targets:
+            raise ValueError("Model has no linear or convolution layers to adapt")
+        # Weights loaded under ComfyUI's inference mode are inference tensors,
+        # which autograd cannot save for backward. They are replaced by
+        # normal copies one tensor at a time, so peak memory barely grows;
+        # this must run outside inference mode
+        for module in model.modules():
+            for name, tensor in itertools.chain(list(module.named_parameters(recurse=False)),
+                                                list(module.named_buffers(recurse=False))):
+                if not tensor.is_inference():
+                    continue
+                copy = tensor.detach().clone()
+                if isinstance(tensor, nn.Parameter):
+                    copy = nn.Parameter(copy, requires_grad=tensor.requires_grad)
+                setattr(module, name, copy)
+        for parameter in model.parameters():
+            parameter.requires_grad_(False)
+
+        for name, module in targets:
+            adapter_class = LoRALinear if isinstance(module, nn.Linear) else LoRAConv2d
+            weight = module.weight
+            adapter = adapter_class(module, rank, alpha, dropout).to(weight.device)
+            key = name.replace(".", "_")
+            self.adapters[key] = adapter
+            self.layer_names[key] = name
+            self._handles.append(module.register_forward_hook(functools.partial(_adapter_hook, adapter)))
+
+    def trainable_parameters(self) -> List[nn.Parameter]:
+        return list(self.adapters.parameters())
+
+    def lora_state_dict(self) -> Dict[str, torch.Tensor]:
+        """Adapter weights keyed by the adapted layer's name, on the CPU."""
+        state = {}
+        for key, adapter in self.adapters.items():
+            name = self.layer_names[key]
+            state[f"{name}.lora_down.weight"] = adapter.lora_down.weight.detach().cpu().clone()
+            state[f"{name}.lora_up.weight"] = adapter.lora_up.weight.detach().cpu().clone()
+            state[f"{name}.alpha"] = torch.tensor(float(self.alpha))
+        return state
+
+    def load_lora_state_dict(self, state: Dict[str, torch.Tensor]) -> None:
+        """Copy weights saved by ``lora_state_dict`` into the adapters."""
+        missing = [name for name in self.layer_names.values() if f"{name}.lora_down.weight" not in state]
+        if missing:
+            raise ValueError(f"LoRA weights are missing {len(missing)} adapted layers, e.g. '{missing[0]}'")
+        with torch.no_grad():
+            for key, adapter in self.adapters.items():
+                name = self.layer_names[key]
+                adapter.lora_down.weight.copy_(state[f"{name}.lora_down.weight"])
+                adapter.lora_up.weight.copy_(state[f"{name}.lora_up.weight"])
+
+    def remove(self) -> None:
+        """Detach the adapters and restore the model's trainable flags."""
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+        model = self._model[0]
+        for name, parameter in model.named_parameters():
+            parameter.requires_grad_(self._requires_grad.get(name, parameter.requires_grad))
+
+def get_diffusion_module(model) -> nn.Module:
+    """The ``nn.Module`` that adapters attach to for a ComfyUI ``MODEL`` or module."""
+    inner = getattr(model, "model", None)
+    diffusion_model = getattr(inner, "diffusion_model", None)
+    if isinstance(diffusion_model, nn.Module):
+        return diffusion_model
+    if isinstance(model, nn.Module):
+        return model
+    raise ValueError(f"Cannot apply adapters to a model of type {type(model).__name__}")
+
+def _checkpointed_forward(forward, *args, **kwargs):
+    if torch.is_grad_enabled():
+        return checkpoint(forward, *args, use_reentrant=False, **kwargs)
+    return forward(*args, **kwargs)
+
+def enable_gradient_checkpointing(model: nn.Module) -> List[nn.Module]:
+    """Recompute the activations of the model's repeated blocks in backward.
+
+    Every element of each outermost ``nn.ModuleList`` is treated as a block,
+    which matches how UNet and transformer stages are stored. Returns the
+    wrapped blocks for ``disable_gradient_checkpointing``.
+    """
+    blocks = []
+    pending = [model]
+    while pending:
+        module = pending.pop()
+        for child in module.children():
+            if isinstance(child, nn.ModuleList):
+                blocks.extend(child)
+            else:
+                pending.append(child)
+    for block in blocks:
+        block.forward = functools.partial(_checkpointed_forward, block.forward)
+    return blocks
+
+def disable_gradient_checkpointing(blocks: List[nn.Module]) -> None:
+    for block in blocks:
+        # Drop the instance attribute so the class forward is used again
+        block.__dict__.pop("forward", None)
+
+@dataclass
+class LoRAModel:
+    """Trained adapter weights, as passed between nodes."""
+
+    name: str
+    rank: int
+    alpha: float
+    state_dict: Dict[str, torch.Tensor]
+    path: Optional[str] = None
@@ -5,6 +5,14 @@ LoRA training node implementation.
 import torch
 from typing import Dict, Any, Tuple
 from ..base import SidekickBaseNode
+from ...utils.tensor_io import save_tensors
+from ...config.paths import get_checkpoint_path, get_models_path, get_safe_filename, reserve_unique_filename
+from .buckets import build_bucket_index
+from .cache import BucketedDatasetCache, DatasetCache, get_dataset_cache_dir
+from .checkpoint import CheckpointWriter, find_latest_checkpoint, restore_training_state
+from .engine import MIXED_PRECISION, DenoisingObjective, LoRATrainingEngine
+from .loader import StreamingDataLoader, scan_dataset
+from .lora import LoRAModel, LoRANetwork, disable_gradient_checkpointing, enable_gradient_checkpointing
 
 class LoRATrainerNode(SidekickBaseNode):
     """Node for training LoRA models."""
@@ -30,14 +38,27 @@ class LoRATrainerNode(SidekickBaseNode):
                 "alpha": ("FLOAT", {"default": 32.0, "min": 1.0, "max": 128.0}),
                 "dropout": ("FLOAT", {"default": 0.1, "min": 0.0, "max": 0.5, "step": 0.01}),
                 "save_every": ("INT", {"default": 5, "min": 1, "max": 100}),
+                "resolution": ("INT", {"default": 512, "min": 64, "max": 2048, "step": 64}),
+                "num_workers": ("INT", {"default": 0, "min": 0, "max": 64}),
+                "cache_dataset": ("BOOLEAN", {"default": True}),
+                "bucketing": ("BOOLEAN", {"default": True}),
+                "mixed_precision": (MIXED_PRECISION, {"default": "bf16"}),
+                "gradient_checkpointing": ("BOOLEAN", {"default": False}),
+                "gradient_accumulation": ("INT", {"default": 1, "min": 1, "max": 64}),
+                "keep_checkpoints": ("INT", {"default": 3, "min": 1, "max": 100}),
+                "resume": ("BOOLEAN", {"default": False}),
+                "vae": ("VAE",),
+                "conditioning": ("CONDITIONING",),
             }
         }
     
     def execute(self, base_model, dataset_path, output_name, learning_rate, 
-                batch_size, epochs, rank, alpha=32.0, dropout=0.1, save_every=5) -> Tuple:
+                batch_size, epochs, rank, alpha=32.0, dropout=0.1, save_every=5,
+                resolution=512, num_workers=0, cache_dataset=True, bucketing=True,
+                mixed_precision="bf16", gradient_checkpointing=False, gradient_accumulation=1,
+                keep_checkpoints=3, resume=False, vae=None, conditioning=None) -> Tuple:
         """Execute LoRA training."""
         
-        # Placeholder implementation - will be expanded in later tasks
         training_log = f"LoRA Training Started:\n"
         training_log += f"- Model: {output_name}\n"
         training_log += f"- Learning Rate: {learning_rate}\n"
@@ -46,7 +67,71 @@ class LoRATrainerNode(SidekickBaseNode):
         training_log += f"- Rank: {rank}\n"
         training_log += f"- Alpha: {alpha}\n"
         training_log += f"- Dropout: {dropout}\n"
-        training_log += "Training will be implemented in next phase."
+        training_log += f"- Precision: {mixed_precision}, Gradient Accumulation: {gradient_accumulation}\n"
         
-        # Return placeholder model and log
-        return (base_model, training_log)
+        if not dataset_path:
+            raise ValueError("No dataset path given; nothing to train on")
+        
+        items = scan_dataset(dataset_path)
+        
+        # Batch images with others of a similar aspect ratio, letterboxed
+        # into a bucket of about resolution² pixels, instead of cropping
+        # everything square
+        bucket_index = None
+        if bucketing:
+            bucket_index = build_bucket_index(items, resolution, num_workers=num_workers)
+            training_log += f"- Dataset: {len(items)} images in aspect-ratio buckets\n"
+            training_log += bucket_index.summary(resolution)
+        else:
+            training_log += f"- Dataset: {len(items)} images at {resolution}x{resolution}\n"
+        
+        # Decode the dataset once; later epochs and runs read the cache
+        cache = None
+        if cache_dataset and bucket_index is not None:
+            cache = BucketedDatasetCache(dataset_path, bucket_index).build(items, num_workers)
+            training_log += cache.summary()
+        elif cache_dataset:
+            cache_dir = get_dataset_cache_dir(dataset_path, resolution, resolution)
+            cache = DatasetCache(cache_dir, resolution, resolution).build(items, num_workers)
+            training_log += cache.summary()
+        
+        safe_name = get_safe_filename(output_name) or "sidekick_lora"
+        checkpoint_dir = get_checkpoint_path()
+        fit = "pad" if bucket_index is not None else "crop"
+        
+        # ComfyUI runs nodes under torch.inference_mode(); adapters created
+        # there would be inference tensors that autograd cannot train
+        with torch.inference_mode(False), torch.enable_grad():
+            objective = DenoisingObjective(base_model, vae, conditioning)
+            network = LoRANetwork(objective.module, rank, alpha, dropout)
+            checkpointed = enable_gradient_checkpointing(objective.module) if gradient_checkpointing else []
+            try:
+                engine = LoRATrainingEngine(network, objective, learning_rate, gradient_accumulation,
+                                            mixed_precision)
+                resumed_from = find_latest_checkpoint(checkpoint_dir, safe_name) if resume else None
+                if resumed_from is not None:
+                    restore_training_state(engine, resumed_from)
+                # Checkpoints are written in the background while training continues
+                with CheckpointWriter(checkpoint_dir, safe_name, keep_checkpoints) as writer, \
+                        StreamingDataLoader(items, batch_size, resolution, resolution, num_workers=num_workers,
+                                            cache=cache, fit=fit, buckets=bucket_index) as loader:
+                    stats = engine.train(loader, epochs, save_every, writer.save)
+                state_dict = network.lora_state_dict()
+            finally:
+                # The base model is shared with the rest of the graph
+                disable_gradient_checkpointing(checkpointed)
+                network.remove()
+        
+        with reserve_unique_filename(get_models_path(), safe_name, ".safetensors") as output_path:
+            save_tensors(output_path, state_dict, {"rank": str(rank), "alpha": str(alpha)})
+        
+        training_log += f"- Adapted Layers: {len(network.adapters)}\n"
+        if resumed_from is not None:
+            training_log += f"- Resumed From: {resumed_from}\n"
+        training_log += stats.summary()
+        training_log += loader.stats.summary()
+        training_log += writer.summary()
+        training_log += f"- Saved: {output_path}\n"
+        
+        lora_model = LoRAModel(output_name, rank, alpha, state_dict, output_path)
+        return (lora_model, training_log)
@@ -0,0 +1,139 @@
+"""
+Lazy node registry for Sidekick.
+
+ComfyUI imports every custom node pack at startup, so importing torch,
+cv2 and torchvision here would add to every cold start. Instead, nodes
+are described by a static manifest and registered as lightweight proxy
+classes; a node's module (and its heavy dependencies) is imported the
+first time anything other than its name, display name or category is
+accessed, e.g. ``INPUT_TYPES`` or instantiation for ``execute``.
+
+This module must not import torch or any node module at import time.
+"""
+
+import importlib
+import os
+import sys
+from typing import Any, Callable, Dict, NamedTuple
+
+class NodeSpec(NamedTuple):
+    """Static description of a node, available without importing it."""
+
+    class_name: str
+    module: str  # Relative to the ``nodes`` package
+    display_name: str
+    category: str
+
+NODE_MANIFEST = (
+    NodeSpec("LoRATrainerNode", ".lora_training.trainer", "LoRA Trainer", "sidekick/lora"),
+    NodeSpec("SidekickImageGeneratorNode", ".image_generation.generator",
+             "Sidekick Image Generator", "sidekick/generation"),
+    NodeSpec("LoRAStackNode", ".image_generation.lora_stack", "LoRA Stack", "sidekick/lora"),
+    NodeSpec("LineArtCleanupNode", ".line_art_processing.cleanup", "Line Art Cleanup", "sidekick/line_art"),
+    NodeSpec("ABComparisonNode", ".comparison.ab_comparison", "A/B Image Comparison", "sidekick/comparison"),
+    NodeSpec("ImageMetricsNode", ".comparison.metrics", "Image Quality Metrics", "sidekick/comparison"),
+    NodeSpec("ComparisonMatrixNode", ".comparison.matrix", "Comparison Matrix", "sidekick/comparison"),
+    NodeSpec("ImageAnimatorNode", ".video_output.animator", "Image Animator", "sidekick/video"),
+)
+
+# Modules whose import dominates startup time
+HEAVY_MODULES = ("torch", "torchvision", "cv2", "PIL", "numpy")
+
+_NODES_PACKAGE = __name__.rpartition(".")[0]
+
+class LazyNodeMeta(type):
+    """Metaclass of node proxies that loads the real node on first use."""
+
+    def __getattr__(cls, name: str) -> Any:
+        # Only called for attributes the proxy does not define itself
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(cls.load(), name)
+
+    def __call__(cls, *args, **kwargs):
+        return cls.load()(*args, **kwargs)
+
+    def load(cls) -> type:
+        """Import the node's module and return the real node class."""
+        node_class = cls.__dict__.get("_node_class")
+        if node_class is None:
+            module = importlib.import_module(cls._spec.module, _NODES_PACKAGE)
+            node_class = getattr(module, cls._spec.class_name)
+            cls._node_class = node_class
+        return node_class
+
+    @property
+    def loaded(cls) -> bool:
+        """Whether the real node class has been imported."""
+        return cls.__dict__.get("_node_class") is not None
+
+def lazy_node(spec: NodeSpec) -> type:
+    """Create the proxy class registered with ComfyUI for a node."""
+    return LazyNodeMeta(spec.class_name, (), {
+        "__module__": _NODES_PACKAGE + spec.module,
+        "__doc__": f"Lazy proxy for {spec.class_name}.",
+        "_spec": spec,
+        "_node_class": None,
+        "CATEGORY": spec.category,
+        "DISPLAY_NAME": spec.display_name,
+    })
+
+def lazy_exports(package: str, exports: Dict[str, str]) -> Callable[[str], Any]:
+    """Build a module ``__getattr__`` that imports exported names on demand.
+
+    Args:
+        package: ``__name__`` of the package doing the exporting.
+        exports: Exported name -> relative module that defines it.
+    """
+    def __getattr__(name: str) -> Any:
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        return getattr(importlib.import_module(module, package), name)
+
+    return __getattr__
+
+def measure_import_time(python: str = sys.executable) -> Dict[str, Any]:
+    """Measure Sidekick's contribution to startup in a fresh interpreter.
+
+    Imports the package in a subprocess the way ComfyUI loads it
+    and reports how long the import took, the heavy modules it pulled in,
+    and how long the first node load takes.
+
+    Returns:
+        Dict with ``import_ms``, ``heavy_modules`` (list of names) and
+        ``first_node_ms``.
+
+    Raises:
+        RuntimeError: If the package fails to import in the subprocess.
+    """
+    import json
+    import subprocess
+    
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    package = os.path.basename(package_dir)
+    first_node = NODE_MANIFEST[0].class_name
+    # __import__ accepts directory names that are not identifiers, as
+    # custom node folders often are
+    script = (
+        "import json, sys, time\n"
+        f"sys.path.insert(0, {os.path.dirname(package_dir)!r})\n"
+        "start = time.perf_counter()\n"
+        f"pkg = __import__({package!r})\n"
+        "import_ms = (time.perf_counter() - start) * 1000\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "start = time.perf_counter()\n"
+        f"pkg.NODE_CLASS_MAPPINGS[{first_node!r}].INPUT_TYPES()\n"
+        "first_node_ms = (time.perf_counter() - start) * 1000\n"
+        "print(json.dumps({'import_ms': import_ms, 'heavy_modules': heavy, 'first_node_ms': first_node_ms}))\n"
+    )
+    result = subprocess.run([python, "-c", script], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {package} failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    report = measure_import_time()
+    print(f"Sidekick import: {report['import_ms']:.1f} ms")
+    print(f"Heavy modules imported at startup: {', '.join(report['heavy_modules']) or 'none'}")
+    print(f"First node load: {report['first_node_ms']:.1f} ms")
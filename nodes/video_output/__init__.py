@@ -2,8 +2,13 @@
 Video output and animation nodes.
 """
 
-from .animator import ImageAnimatorNode
-from .video_export import VideoExportNode
-from .frame_interpolation import FrameInterpolationNode
+from ..registry import lazy_exports
+
+# Node modules are imported when their class is first accessed
+__getattr__ = lazy_exports(__name__, {
+    "ImageAnimatorNode": ".animator",
+    "VideoExportNode": ".video_export",
+    "FrameInterpolationNode": ".frame_interpolation",
+})
 
 __all__ = ["ImageAnimatorNode", "VideoExportNode", "FrameInterpolationNode"]
@@ -6,6 +6,10 @@ import torch
 import math
 from typing import Dict, Any, Tuple, List
 from ..base import SidekickVideoNode
+from .frame_source import LazyFrameSource
+from .curves import EASINGS, ease, parameter_table, parse_bezier, slice_table
+from .renderer import frames_per_chunk, render_animation, render_table
+from ...utils.image_utils import detect_layout, to_bchw
 
 class ImageAnimatorNode(SidekickVideoNode):
     """Node for animating images with various effects."""
@@ -28,57 +32,97 @@ class ImageAnimatorNode(SidekickVideoNode):
             },
             "optional": {
                 "intensity": ("FLOAT", {"default": 1.0, "min": 0.1, "max": 3.0, "step": 0.1}),
-                "easing": (["linear", "ease_in", "ease_out", "ease_in_out"], {"default": "ease_out"}),
+                "easing": (EASINGS, {"default": "ease_out"}),
+                "bezier": ("STRING", {"default": "0.25, 0.1, 0.25, 1.0"}),
+                "keyframes": ("STRING", {"multiline": True, "default": ""}),
                 "loop": ("BOOLEAN", {"default": False}),
+                "lazy_frames": ("BOOLEAN", {"default": False}),
+                "frame_cache_size": ("INT", {"default": 8, "min": 1, "max": 600}),
+                "render_mode": (["auto", "batched", "per_frame"], {
+                    "default": "auto",
+                    "tooltip": "batched warps whole chunks with sub-pixel zooms and pans; per_frame "
+                               "snaps them to whole pixels, so zoom and pan frames differ slightly "
+                               "between the two (about 0.005-0.01 mean on [0, 1] images). auto "
+                               "renders presets per frame, which is faster, and keyframes batched.",
+                }),
             }
         }
     
     def execute(self, image, animation_type, duration, fps, 
-                intensity=1.0, easing="ease_out", loop=False) -> Tuple:
+                intensity=1.0, easing="ease_out", bezier="0.25, 0.1, 0.25, 1.0", keyframes="",
+                loop=False, lazy_frames=False, frame_cache_size=8, render_mode="auto") -> Tuple:
         """Generate animated frames from static image."""
         
-        total_frames = int(duration * fps)
-        frames = []
+        if easing == "cubic_bezier":
+            easing = parse_bezier(bezier)
         
-        for frame_idx in range(total_frames):
-            progress = frame_idx / (total_frames - 1) if total_frames > 1 else 0
-            
-            # Apply easing function
-            eased_progress = self._apply_easing(progress, easing)
-            
-            # Generate frame based on animation type
-            frame = self._generate_frame(image, animation_type, eased_progress, intensity)
-            frames.append(frame)
+        frame_source = self.create_frame_source(image, animation_type, duration, fps,
+                                                intensity, easing, loop, frame_cache_size,
+                                                render_mode, keyframes)
         
-        # Create loop frames if requested
-        if loop and len(frames) > 1:
-            # Add reverse frames (excluding first and last to avoid duplicates)
-            reverse_frames = frames[-2:0:-1]
-            frames.extend(reverse_frames)
+        # Materialize unless the consumer can stream frames on demand
+        frames = frame_source if lazy_frames else frame_source.materialize()
         
         animation_info = f"Animation Generated:\n"
-        animation_info += f"- Type: {animation_type}\n"
+        animation_info += f"- Type: {'keyframes' if keyframes.strip() else animation_type}\n"
         animation_info += f"- Duration: {duration}s\n"
         animation_info += f"- FPS: {fps}\n"
         animation_info += f"- Total Frames: {len(frames)}\n"
         animation_info += f"- Intensity: {intensity}\n"
         animation_info += f"- Easing: {easing}\n"
         animation_info += f"- Loop: {loop}\n"
+        animation_info += f"- Lazy Frames: {lazy_frames}\n"
+        animation_info += f"- Render Mode: {render_mode}\n"
         
         return (frames, animation_info)
     
-    def _apply_easing(self, t: float, easing_type: str) -> float:
-        """Apply easing function to progress value."""
-        if easing_type == "linear":
-            return t
-        elif easing_type == "ease_in":
-            return t * t
-        elif easing_type == "ease_out":
-            return 1 - (1 - t) * (1 - t)
-        elif easing_type == "ease_in_out":
-            return 2 * t * t if t < 0.5 else 1 - 2 * (1 - t) * (1 - t)
+    def create_frame_source(self, image: torch.Tensor, animation_type: str, duration: float,
+                            fps: int, intensity: float = 1.0, easing="ease_out",
+                            loop: bool = False, cache_size: int = 8,
+                            render_mode: str = "auto", keyframes: str = "") -> LazyFrameSource:
+        """Describe the animation as a lazy frame source without rendering it.
+        
+        Per-frame parameters come from a cached curve table. In ``batched``
+        mode frames are rendered in memory-bounded chunks by a single affine
+        warp per chunk (zooms and pans by separable gathers), with sub-pixel
+        zooms and pans; ``per_frame`` uses the per-frame transforms below,
+        which crop and shift by whole pixels, so zoom and pan frames of the
+        two modes differ by about 0.005-0.01 mean absolute error. ``auto``
+        picks ``per_frame`` for presets, where its whole-pixel copies
+        measure faster (see ``benchmark_render_modes``). Keyframe curves
+        always render batched.
+        """
+        keyframes = keyframes.strip()
+        table = parameter_table(animation_type, duration, fps, easing, intensity, keyframes)
+        
+        if render_mode == "auto":
+            render_mode = "batched" if keyframes else "per_frame"
+        
+        if render_mode == "batched" or keyframes:
+            def render(indices: List[int]) -> List[torch.Tensor]:
+                frames = render_table(image, slice_table(table, indices[0], indices[-1] + 1))
+                return list(frames.unbind(0))
+            
+            frame_params = list(range(len(table["progress"])))
+            chunk_size = frames_per_chunk(to_bchw(image), 512.0)
         else:
-            return t
+            # The per-frame transforms work on BCHW
+            channels_last = detect_layout(image) == "BHWC"
+            source = to_bchw(image)
+            
+            def render(values: List[float]) -> List[torch.Tensor]:
+                frames = [self._generate_frame(source, animation_type, p, intensity) for p in values]
+                return [frame.permute(0, 2, 3, 1) for frame in frames] if channels_last else frames
+            
+            frame_params = table["progress"].tolist()
+            chunk_size = 1
+        
+        return LazyFrameSource(render, frame_params, loop=loop, cache_size=cache_size,
+                               chunk_size=chunk_size)
+    
+    def _apply_easing(self, t: float, easing_type) -> float:
+        """Apply easing function to progress value."""
+        return ease(t, easing_type)
     
     def _generate_frame(self, image: torch.Tensor, animation_type: str, 
                        progress: float, intensity: float) -> torch.Tensor:
@@ -159,10 +203,48 @@ class ImageAnimatorNode(SidekickVideoNode):
     
     def _apply_rotation(self, image: torch.Tensor, angle: float) -> torch.Tensor:
         """Apply rotation transformation."""
-        # Placeholder for rotation - would need more complex implementation
-        # For now, return original image
-        return image
+        return render_animation(image, "rotate", [angle / 360.0])[0]
     
     def _apply_fade(self, image: torch.Tensor, alpha: float) -> torch.Tensor:
         """Apply fade effect."""
         return image * alpha
+
+def benchmark_render_modes(size: int = 512, duration: float = 2.0, fps: int = 30,
+                           repeats: int = 3, device: str = "cpu") -> Dict[str, Dict[str, float]]:
+    """Measure frames per second of the batched and per-frame render modes.
+
+    Each preset is materialized once per mode from a random ``size`` x
+    ``size`` image on ``device``, which is what ``auto`` chooses between.
+
+    Returns:
+        Dict keyed by animation type of ``{"batched": fps, "per_frame": fps}``
+        (best of ``repeats`` runs each).
+    """
+    import time
+    
+    node = ImageAnimatorNode()
+    image = torch.rand((1, size, size, 3), generator=torch.Generator().manual_seed(0)).to(device)
+    animation_types = ImageAnimatorNode.INPUT_TYPES()["required"]["animation_type"][0]
+    
+    def best_fps(animation_type: str, render_mode: str) -> float:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            frames = node.create_frame_source(image, animation_type, duration, fps,
+                                              render_mode=render_mode).materialize()
+            if image.is_cuda:
+                torch.cuda.synchronize()
+            best = min(best, time.perf_counter() - start)
+        return len(frames) / best
+    
+    return {
+        animation_type: {mode: best_fps(animation_type, mode) for mode in ("batched", "per_frame")}
+        for animation_type in animation_types
+    }
+
+if __name__ == "__main__":
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"Device: {device}")
+    for animation_type, results in benchmark_render_modes(device=device).items():
+        print(f"{animation_type}: batched {results['batched']:.0f} frames/s, "
+              f"per_frame {results['per_frame']:.0f} frames/s")
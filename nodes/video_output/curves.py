@@ -0,0 +1,226 @@
+"""
+Vectorized easing and keyframe curves for animations.
+
+Easing and keyframe interpolation are evaluated for every frame of a clip
+in a single tensor op, and the resulting per-frame parameter tables are
+cached so repeated renders of the same clip skip the work entirely.
+
+A parameter table maps track names to ``[T]`` float64 tensors:
+
+- ``progress``: eased progress of preset animations
+- ``scale``: zoom factor (1 = unchanged)
+- ``pan_x`` / ``pan_y``: shift as a fraction of width / height
+- ``rotation``: rotation in degrees
+- ``alpha``: brightness factor (1 = unchanged)
+"""
+
+import json
+import math
+import torch
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+EASINGS = ["linear", "ease_in", "ease_out", "ease_in_out", "cubic_bezier"]
+
+# Neutral value of each transform track
+TRACK_DEFAULTS = {"scale": 1.0, "pan_x": 0.0, "pan_y": 0.0, "rotation": 0.0, "alpha": 1.0}
+
+Easing = Union[str, Tuple[float, float, float, float]]
+
+def parse_bezier(text: str) -> Tuple[float, float, float, float]:
+    """Parse ``"x1, y1, x2, y2"`` cubic-bezier control points."""
+    try:
+        points = tuple(float(v) for v in text.replace(" ", "").split(","))
+    except ValueError:
+        raise ValueError(f"Invalid cubic-bezier '{text}'")
+    if len(points) != 4:
+        raise ValueError(f"Cubic-bezier needs 4 values, got {len(points)}")
+    if not (0.0 <= points[0] <= 1.0 and 0.0 <= points[2] <= 1.0):
+        raise ValueError("Cubic-bezier x control points must be within [0, 1]")
+    return points
+
+def cubic_bezier(t: torch.Tensor, x1: float, y1: float, x2: float, y2: float,
+                 iterations: int = 40) -> torch.Tensor:
+    """CSS-style cubic-bezier easing evaluated for all ``t`` at once.
+
+    The curve parameter for each ``t`` is found by vectorized bisection on
+    the (monotonic) x polynomial, then the y polynomial is evaluated.
+    """
+    def polynomial(s, p1, p2):
+        return 3 * (1 - s) ** 2 * s * p1 + 3 * (1 - s) * s ** 2 * p2 + s ** 3
+
+    low = torch.zeros_like(t)
+    high = torch.ones_like(t)
+    for _ in range(iterations):
+        mid = (low + high) * 0.5
+        below = polynomial(mid, x1, x2) < t
+        low = torch.where(below, mid, low)
+        high = torch.where(below, high, mid)
+    return polynomial((low + high) * 0.5, y1, y2)
+
+def ease(t: Union[float, torch.Tensor], easing: Easing = "linear") -> Union[float, torch.Tensor]:
+    """Apply an easing function to progress values in [0, 1].
+
+    Args:
+        t: A tensor of progress values, or a single float, which is eased
+            without building a tensor.
+        easing: Easing name or ``(x1, y1, x2, y2)`` cubic-bezier points.
+    """
+    if isinstance(easing, (tuple, list)):
+        if isinstance(t, torch.Tensor):
+            return cubic_bezier(t, *easing)
+        return cubic_bezier(torch.tensor([t], dtype=torch.float64), *easing).item()
+    if easing == "ease_in":
+        return t * t
+    if easing == "ease_out":
+        return 1 - (1 - t) * (1 - t)
+    if easing == "ease_in_out":
+        if not isinstance(t, torch.Tensor):
+            return 2 * t * t if t < 0.5 else 1 - 2 * (1 - t) * (1 - t)
+        return torch.where(t < 0.5, 2 * t * t, 1 - 2 * (1 - t) * (1 - t))
+    return t
+
+def frame_progress(frame_count: int) -> torch.Tensor:
+    """Linear progress from 0 to 1 over ``frame_count`` frames."""
+    if frame_count <= 1:
+        return torch.zeros(max(frame_count, 0), dtype=torch.float64)
+    return torch.arange(frame_count, dtype=torch.float64) / (frame_count - 1)
+
+@dataclass
+class Keyframe:
+    """Value of a track at a point in time.
+
+    ``easing`` shapes the segment that ends at this keyframe.
+    """
+
+    time: float
+    value: float
+    easing: Easing = "linear"
+
+class Curve:
+    """Piecewise keyframe curve evaluated for all frames at once."""
+
+    def __init__(self, keyframes: Sequence[Keyframe]):
+        if not keyframes:
+            raise ValueError("A curve needs at least one keyframe")
+        self.keyframes = sorted(keyframes, key=lambda k: k.time)
+
+    def evaluate(self, t: torch.Tensor) -> torch.Tensor:
+        """Evaluate the curve at times ``t`` (clamped to the first/last keyframe)."""
+        times = torch.tensor([k.time for k in self.keyframes], dtype=t.dtype)
+        values = torch.tensor([k.value for k in self.keyframes], dtype=t.dtype)
+        if len(self.keyframes) == 1:
+            return values.expand_as(t).clone()
+
+        # Segment i spans keyframes i and i + 1
+        segment = (torch.searchsorted(times, t, right=True) - 1).clamp_(0, len(times) - 2)
+        start, end = times[segment], times[segment + 1]
+        span = (end - start).clamp_(min=1e-12)
+        local = ((t - start) / span).clamp_(0.0, 1.0)
+
+        # One tensor op per distinct easing, not per frame
+        eased = local.clone()
+        segment_easings = [k.easing for k in self.keyframes[1:]]
+        for easing in set(map(_easing_key, segment_easings)):
+            if easing == "linear":
+                continue
+            segments = [i for i, e in enumerate(segment_easings) if _easing_key(e) == easing]
+            mask = torch.isin(segment, torch.tensor(segments))
+            eased[mask] = ease(local[mask], easing)
+
+        return values[segment] + (values[segment + 1] - values[segment]) * eased
+
+def _easing_key(easing: Easing) -> Easing:
+    return tuple(easing) if isinstance(easing, (tuple, list)) else easing
+
+def parse_keyframes(text: str) -> Dict[str, Curve]:
+    """Parse a JSON keyframe spec into named track curves.
+
+    Format: ``{"scale": [[0, 1.0], [1, 1.5, "ease_out"]], "alpha": ...}``
+    where each keyframe is ``[time, value]`` or ``[time, value, easing]``
+    and easing is a name or a ``[x1, y1, x2, y2]`` cubic-bezier.
+    """
+    try:
+        spec = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid keyframe JSON: {e}")
+    if not isinstance(spec, dict):
+        raise ValueError("Keyframes must be a JSON object of tracks")
+
+    tracks = {}
+    for name, points in spec.items():
+        if name not in TRACK_DEFAULTS:
+            raise ValueError(f"Unknown track '{name}', expected one of {list(TRACK_DEFAULTS)}")
+        keyframes = []
+        for point in points:
+            easing = point[2] if len(point) > 2 else "linear"
+            if isinstance(easing, list):
+                easing = parse_bezier(",".join(str(v) for v in easing))
+            keyframes.append(Keyframe(float(point[0]), float(point[1]), easing))
+        tracks[name] = Curve(keyframes)
+    return tracks
+
+def preset_table(animation_type: str, progress: torch.Tensor, intensity: float) -> Dict[str, torch.Tensor]:
+    """Track values of a preset animation for eased progress values."""
+    table = {"progress": progress}
+    offset = progress * intensity * 0.2
+    if animation_type == "zoom_in":
+        table["scale"] = 1.0 + progress * intensity
+    elif animation_type == "zoom_out":
+        table["scale"] = 1.0 + intensity - progress * intensity
+    elif animation_type == "pan_left":
+        table["pan_x"] = -offset
+    elif animation_type == "pan_right":
+        table["pan_x"] = offset
+    elif animation_type == "pan_up":
+        table["pan_y"] = -offset
+    elif animation_type == "pan_down":
+        table["pan_y"] = offset
+    elif animation_type == "rotate":
+        table["rotation"] = progress * intensity * 360.0
+    elif animation_type == "fade":
+        table["alpha"] = 1.0 - progress * intensity
+    elif animation_type == "pulse":
+        table["alpha"] = 0.5 + 0.5 * torch.sin(progress * math.pi * 4 * intensity)
+    return table
+
+@lru_cache(maxsize=64)
+def _cached_table(animation_type: str, frame_count: int, easing: Easing,
+                  intensity: float, keyframes: str) -> Tuple[Tuple[str, torch.Tensor], ...]:
+    t = frame_progress(frame_count)
+    progress = ease(t, easing)
+    if keyframes:
+        # Keyframe times are clip fractions; their segments carry their own easing
+        table = {"progress": progress}
+        for name, curve in parse_keyframes(keyframes).items():
+            table[name] = curve.evaluate(t)
+    else:
+        table = preset_table(animation_type, progress, intensity)
+    return tuple(table.items())
+
+def parameter_table(animation_type: str, duration: float, fps: int, easing: Easing = "ease_out",
+                    intensity: float = 1.0, keyframes: Optional[str] = None) -> Dict[str, torch.Tensor]:
+    """Per-frame parameter table of an animation, cached by its settings.
+
+    Args:
+        animation_type: Preset animation name; ignored when keyframes are given.
+        duration: Clip length in seconds.
+        fps: Frames per second.
+        easing: Easing name or cubic-bezier points applied to clip progress.
+        intensity: Preset animation strength.
+        keyframes: Optional JSON keyframe spec (see ``parse_keyframes``);
+            tracks are evaluated at the linear clip time, so keyframe times
+            are not shifted by ``easing``.
+
+    Returns:
+        Dict of ``[T]`` float64 tensors. Cached tensors are shared, so the
+        returned dict must be treated as read-only.
+    """
+    frame_count = int(duration * fps)
+    return dict(_cached_table(animation_type, frame_count, _easing_key(easing),
+                              float(intensity), keyframes or ""))
+
+def slice_table(table: Dict[str, torch.Tensor], start: int, end: int) -> Dict[str, torch.Tensor]:
+    """Restrict a parameter table to frames ``[start, end)``."""
+    return {name: values[start:end] for name, values in table.items()}
@@ -0,0 +1,89 @@
+"""
+Lazy frame sources for animation nodes.
+"""
+
+import torch
+from collections import OrderedDict
+from typing import Callable, Iterator, List, Sequence
+
+class LazyFrameSource:
+    """Sequence of animation frames that are rendered on demand.
+
+    Frames are described by per-frame parameters (eased progress values or
+    frame indices) and rendered with ``render_fn`` only when accessed. A small LRU keeps the most recently
+    produced frames so sequential readers (such as a streaming encoder)
+    never hold the whole clip in memory. Looping appends the frames in
+    reverse, excluding the first and last, by index rather than by copy.
+
+    The source supports ``len()``, indexing and iteration, so it can be
+    passed anywhere a list of frames is expected.
+
+    Args:
+        render_fn: Renders a list of frame parameters into a list of frames.
+        frame_params: Per-frame parameters of the forward pass.
+        loop: Append the reversed frames to form a ping-pong loop.
+        cache_size: Number of rendered frames kept in the LRU.
+        chunk_size: Frames are rendered in aligned chunks of this size (capped
+            at ``cache_size`` on a miss), letting batched renderers amortize
+            work across frames.
+    """
+
+    def __init__(self, render_fn: Callable[[List], Sequence[torch.Tensor]],
+                 frame_params: Sequence, loop: bool = False,
+                 cache_size: int = 8, chunk_size: int = 1):
+        self.render_fn = render_fn
+        self.frame_params = list(frame_params)
+        self.cache_size = max(1, cache_size)
+        self.chunk_size = max(1, chunk_size)
+        self._cache = OrderedDict()
+
+        count = len(self.frame_params)
+        self._order = list(range(count))
+        if loop and count > 1:
+            self._order.extend(range(count - 2, 0, -1))
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("frame index out of range")
+        return self._get(self._order[index])
+
+    def __iter__(self) -> Iterator[torch.Tensor]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def materialize(self) -> List[torch.Tensor]:
+        """Render every frame once and return them as a list.
+
+        Looped frames reference the forward frames instead of copying them.
+        """
+        frames = []
+        for start in range(0, len(self.frame_params), self.chunk_size):
+            frames.extend(self.render_fn(self.frame_params[start:start + self.chunk_size]))
+        return [frames[i] for i in self._order]
+
+    def _get(self, frame_index: int) -> torch.Tensor:
+        frame = self._cache.get(frame_index)
+        if frame is not None:
+            self._cache.move_to_end(frame_index)
+            return frame
+
+        # Render the aligned chunk so forward and reverse reads both reuse it;
+        # never render more than the LRU can hold
+        chunk_size = min(self.chunk_size, self.cache_size)
+        start = frame_index - frame_index % chunk_size
+        end = min(start + chunk_size, len(self.frame_params))
+        rendered = self.render_fn(self.frame_params[start:end])
+        for offset, rendered_frame in enumerate(rendered):
+            self._cache[start + offset] = rendered_frame
+            self._cache.move_to_end(start + offset)
+        frame = rendered[frame_index - start]
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return frame
@@ -0,0 +1,54 @@
+"""
+LoRA training under the conditions ComfyUI runs nodes in.
+"""
+
+import importlib
+import os
+import sys
+import cv2
+import numpy as np
+import pytest
+import torch
+
+# The repository root is the package; import it by its directory name
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+paths = importlib.import_module(f"{os.path.basename(ROOT)}.config.paths")
+trainer = importlib.import_module(f"{os.path.basename(ROOT)}.nodes.lora_training.trainer")
+
+def _make_model() -> torch.nn.Module:
+    return torch.nn.Sequential(
+        torch.nn.Conv2d(3, 8, 3, padding=1),
+        torch.nn.ReLU(),
+        torch.nn.Conv2d(8, 3, 3, padding=1),
+    )
+
+@pytest.mark.parametrize("model_in_inference_mode", [False, True])
+def test_training_under_inference_mode(tmp_path, monkeypatch, model_in_inference_mode):
+    # Config paths are relative, so models, checkpoints and temp files land here
+    monkeypatch.chdir(tmp_path)
+    paths.clear_directory_cache()
+    dataset = tmp_path / "dataset"
+    dataset.mkdir()
+    rng = np.random.default_rng(0)
+    for i in range(4):
+        cv2.imwrite(str(dataset / f"{i}.png"), rng.integers(0, 256, (64, 64, 3), dtype=np.uint8))
+
+    model = None if model_in_inference_mode else _make_model()
+    with torch.inference_mode():
+        if model is None:
+            # ComfyUI loads models inside inference mode too
+            model = _make_model()
+        lora_model, training_log = trainer.LoRATrainerNode().execute(
+            model, str(dataset), "test_lora", 1e-3, 2, 1, 4, resolution=64,
+            cache_dataset=False, bucketing=False, mixed_precision="no")
+
+    assert os.path.exists(lora_model.path)
+    assert "- Saved:" in training_log
+    up_weights = [tensor for name, tensor in lora_model.state_dict.items() if "lora_up" in name]
+    assert up_weights and any(tensor.abs().sum() > 0 for tensor in up_weights)
+    # The base model is left as it was found
+    assert all(parameter.requires_grad for parameter in model.parameters())
+    x = torch.rand(1, 3, 16, 16)
+    with torch.inference_mode():
+        assert model(x).shape == x.shape
@@ -3,8 +3,7 @@ Utility functions for Sidekick.
 """
 
 from .image_utils import resize_image, normalize_image, denormalize_image
-from .model_utils import load_model_safe, get_model_info
 from .validation import validate_inputs, ValidationError
 
 __all__ = ["resize_image", "normalize_image", "denormalize_image",
-           "load_model_safe", "get_model_info", "validate_inputs", "ValidationError"]
+           "validate_inputs", "ValidationError"]
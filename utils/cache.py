@@ -0,0 +1,295 @@
+"""
+Content-addressed caching of node results.
+
+Deterministic nodes are keyed by a fingerprint of their inputs: CPU tensors
+are hashed from all of their bytes, device tensors by a checksum computed on
+the device, opaque objects such as models by identity, and everything else
+from its value. Results are kept in an in-memory LRU with a byte budget and
+can optionally spill to an on-disk tier under the configured temp path.
+Cached results are shared between callers and must be treated as read-only,
+as ComfyUI already requires of node outputs.
+"""
+
+import os
+import hashlib
+import itertools
+import logging
+import threading
+import weakref
+import torch
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Opaque objects get a token that is never reused, unlike ``id()``
+_object_tokens = weakref.WeakKeyDictionary()
+_token_counter = itertools.count()
+_tokens_lock = threading.Lock()
+
+# Keeps tokens of this process apart from disk cache keys of earlier ones
+_process_salt = os.urandom(8).hex()
+
+# int32 words reduced per step when checksumming device tensors
+_CHECKSUM_CHUNK = 1 << 24
+
+def object_identity(value: Any) -> Hashable:
+    """Stable identity of an object (model, text encoder, ...) for cache keys."""
+    with _tokens_lock:
+        try:
+            token = _object_tokens.get(value)
+            if token is None:
+                token = next(_token_counter)
+                _object_tokens[value] = token
+            return ("token", _process_salt, token)
+        except TypeError:
+            # Not weak-referenceable; fall back to the object id
+            return ("id", _process_salt, id(value))
+
+def _device_checksum(data: torch.Tensor) -> bytes:
+    """Plain and position-weighted sums of a flat uint8 tensor's int32 words.
+
+    The reduction runs on the tensor's device, so only a few bytes are
+    copied to the host instead of the whole tensor.
+    """
+    if data.storage_offset() % 4:
+        data = data.clone()
+    tail = len(data) % 4
+    words = data[:len(data) - tail].view(torch.int32)
+    sums = torch.zeros(2, dtype=torch.int64, device=data.device)
+    for start in range(0, len(words), _CHECKSUM_CHUNK):
+        chunk = words[start:start + _CHECKSUM_CHUNK].to(torch.int64)
+        weights = torch.arange(2 * start + 1, 2 * (start + len(chunk)), 2,
+                               dtype=torch.int64, device=data.device)
+        sums[0] += chunk.sum()
+        sums[1] += (chunk * weights).sum()
+    return sums.cpu().numpy().tobytes() + data[len(data) - tail:].cpu().numpy().tobytes()
+
+def _update_tensor(digest, tensor: torch.Tensor) -> None:
+    tensor = tensor.detach()
+    digest.update(f"tensor:{tensor.dtype}:{tuple(tensor.shape)}:{tensor.device.type}".encode())
+    if tensor.numel() == 0:
+        return
+    # Raw bytes also cover dtypes numpy lacks, such as bfloat16
+    data = tensor.contiguous().reshape(-1).view(torch.uint8)
+    if data.device.type == "cpu":
+        digest.update(data.numpy())
+    else:
+        digest.update(_device_checksum(data))
+
+def _update(digest, value: Any) -> None:
+    if isinstance(value, torch.Tensor):
+        _update_tensor(digest, value)
+    elif isinstance(value, np.ndarray):
+        _update_tensor(digest, torch.from_numpy(np.ascontiguousarray(value)))
+    elif isinstance(value, dict):
+        digest.update(b"dict")
+        for key in sorted(value, key=repr):
+            _update(digest, key)
+            _update(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}:{len(value)}".encode())
+        for item in value:
+            _update(digest, item)
+    elif value is None or isinstance(value, (str, int, float, bool, bytes)):
+        digest.update(f"{type(value).__name__}:{value!r}".encode())
+    else:
+        # Opaque objects (models, etc.) are identified by identity
+        digest.update(f"object:{type(value).__qualname__}:{object_identity(value)}".encode())
+
+def fingerprint(value: Any) -> str:
+    """Compute a content fingerprint of node inputs.
+
+    Every byte of every CPU tensor is hashed, so those inputs never share a
+    key when any element differs. Device tensors contribute a checksum
+    reduced on the device (see ``_device_checksum``), which avoids copying
+    them to the host on every call.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    _update(digest, value)
+    return digest.hexdigest()
+
+def result_nbytes(value: Any) -> int:
+    """Approximate memory held by a node result."""
+    if isinstance(value, torch.Tensor):
+        return value.untyped_storage().nbytes()
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sum(result_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(result_nbytes(item) for item in value.values())
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return 64
+
+def is_plain_result(value: Any) -> bool:
+    """Whether ``value`` holds only tensors, primitives and plain containers,
+    so it can be loaded back with ``torch.load(weights_only=True)``."""
+    if type(value) in (torch.Tensor, torch.nn.Parameter):
+        return True
+    if type(value) in (list, tuple):
+        return all(is_plain_result(item) for item in value)
+    if type(value) is dict:
+        return all(type(key) in (str, int) and is_plain_result(item) for key, item in value.items())
+    return value is None or type(value) in (str, int, float, bool, bytes)
+
+class NodeResultCache:
+    """LRU cache of node results bounded by bytes, with an optional disk tier.
+
+    Args:
+        max_bytes: In-memory budget; least recently used results are evicted.
+        disk_path: Directory for the disk tier, or None to disable it. Only
+            plain results (see ``is_plain_result``) are written there, and
+            they are read back without unpickling arbitrary objects.
+        max_disk_bytes: Disk tier budget; oldest files are removed first.
+    """
+
+    def __init__(self, max_bytes: int, disk_path: Optional[str] = None,
+                 max_disk_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if disk_path:
+            os.makedirs(disk_path, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached result for ``key``, or None on a miss.
+
+        The stored objects are returned as they are, not copied, so callers
+        must not modify them in place.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        value = self._load_from_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._store(key, value)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Cache a result in memory and, if enabled, on disk."""
+        self._store(key, value)
+        self._save_to_disk(key, value)
+
+    def clear(self) -> None:
+        """Drop every in-memory entry and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and memory usage."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _store(self, key: str, value: Any) -> None:
+        size = result_nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def _disk_file(self, key: str) -> str:
+        return os.path.join(self.disk_path, f"{key}.pt")
+
+    def _load_from_disk(self, key: str) -> Optional[Any]:
+        if not self.disk_path:
+            return None
+        path = self._disk_file(key)
+        try:
+            value = torch.load(path, map_location="cpu", weights_only=True)
+        except Exception:
+            # Missing, truncated or corrupt entries are misses; corrupt data
+            # can fail anywhere in the unpickler (UnpicklingError,
+            # struct.error, ...), not only with pickle.UnpicklingError
+            return None
+        os.utime(path)
+        return value
+
+    def _save_to_disk(self, key: str, value: Any) -> None:
+        if not self.disk_path or not is_plain_result(value):
+            return
+        path = self._disk_file(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            torch.save(value, temp_path)
+            os.replace(temp_path, path)
+        except Exception as e:
+            # The disk tier is best effort; the result is still cached in memory
+            logger.warning("Error writing node cache entry %s: %s", key, e)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        files = []
+        total = 0
+        for entry in os.scandir(self.disk_path):
+            if entry.name.endswith(".pt"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+_node_cache = None
+_node_cache_lock = threading.Lock()
+
+def get_node_cache() -> NodeResultCache:
+    """Process-wide result cache configured from the Sidekick config."""
+    global _node_cache
+    with _node_cache_lock:
+        if _node_cache is None:
+            from ..config import load_config, get_temp_path
+            config = load_config()
+            disk_path = None
+            if config.cache_disk_enabled:
+                disk_path = os.path.join(get_temp_path(), "node_cache")
+            _node_cache = NodeResultCache(
+                max_bytes=config.cache_max_memory_mb * 1024 * 1024,
+                disk_path=disk_path,
+                max_disk_bytes=config.cache_max_disk_mb * 1024 * 1024,
+            )
+        return _node_cache
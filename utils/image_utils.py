@@ -2,19 +2,238 @@
 Image processing utilities.
 """
 
+import threading
+import weakref
 import torch
+import numpy as np
 import torch.nn.functional as F
+from collections import OrderedDict
 from typing import Tuple, Optional
 
+_CHANNEL_COUNTS = (1, 3, 4)
+
+# Largest scratch buffer a thread keeps per name; bigger ones are not pooled
+SCRATCH_POOL_MB = 64
+
+class _BufferPool(threading.local):
+    """Per-thread scratch buffers, one live buffer per name.
+
+    A buffer is grown when a larger shape is requested and otherwise reused
+    as a view, so alternating frame and tile sizes do not reallocate.
+    Requests above ``SCRATCH_POOL_MB`` get a fresh tensor that is freed
+    with the call, so one large batch does not pin device or host memory
+    for the life of the thread. Buffers are only used for intermediates
+    and are never handed back to callers, so reuse is safe across calls on
+    the same thread.
+    """
+
+    def __init__(self):
+        self.buffers = {}
+
+    def get(self, name: str, shape, dtype: torch.dtype, device,
+            pin_memory: bool = False) -> torch.Tensor:
+        numel = int(np.prod(shape))
+        if numel * torch.empty((), dtype=dtype).element_size() > SCRATCH_POOL_MB * 1024 * 1024:
+            return torch.empty(tuple(shape), dtype=dtype, device=device, pin_memory=pin_memory)
+        buffer = self.buffers.get(name)
+        if (buffer is None or buffer.numel() < numel or buffer.dtype != dtype
+                or buffer.device != torch.device(device)):
+            buffer = torch.empty(numel, dtype=dtype, device=device, pin_memory=pin_memory)
+            self.buffers[name] = buffer
+        return buffer[:numel].view(tuple(shape))
+
+_buffers = _BufferPool()
+
+# Strategies for bringing two images to a common comparison size
+RESIZE_STRATEGIES = ["smallest", "match_a", "match_b"]
+
+# How ``resize_image`` handles a change of aspect ratio
+FIT_MODES = ["stretch", "cover", "contain"]
+
+# Memory kept by cached resize results
+RESIZE_CACHE_MB = 512
+
+def _tensor_version(image: torch.Tensor) -> int:
+    # Inference tensors (ComfyUI runs nodes under inference mode) have no
+    # version counter; like all node outputs they are treated as read-only
+    return -1 if image.is_inference() else image._version
+
+class _ResizeCache:
+    """Resize results keyed by the identity and version of the input tensor.
+
+    Entries hold a weak reference to their input, so a recycled ``id`` or
+    an in-place modification never returns a stale result, and entries are
+    dropped once their input is freed.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Keys of collected inputs; weakref callbacks may run while the lock
+        # is held, so they only queue keys for the next get or put
+        self._dead = []
+
+    def get(self, image: torch.Tensor, params: tuple) -> Optional[torch.Tensor]:
+        key = (id(image),) + params
+        with self._lock:
+            self._purge()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            source, version, result = entry
+            if source() is not image or version != _tensor_version(image):
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def put(self, image: torch.Tensor, params: tuple, result: torch.Tensor) -> None:
+        size = result.untyped_storage().nbytes()
+        if size > self.max_bytes:
+            return
+        key = (id(image),) + params
+        with self._lock:
+            self._purge()
+            self._drop(key)
+            source = weakref.ref(image, lambda _, key=key: self._dead.append(key))
+            self._entries[key] = (source, _tensor_version(image), result)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted.untyped_storage().nbytes()
+
+    def _drop(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2].untyped_storage().nbytes()
+
+    def _purge(self) -> None:
+        while self._dead:
+            key = self._dead.pop()
+            entry = self._entries.get(key)
+            # The key may already belong to a newer input with a recycled id
+            if entry is not None and entry[0]() is None:
+                self._drop(key)
+
+_resize_cache = _ResizeCache(RESIZE_CACHE_MB * 1024 * 1024)
+
 def resize_image(image: torch.Tensor, target_size: Tuple[int, int], 
-                mode: str = 'bilinear') -> torch.Tensor:
-    """Resize image tensor to target size."""
+                mode: str = 'bilinear', antialias: bool = False, fit: str = "stretch",
+                memory_budget_mb: float = 256.0, cache: bool = False) -> torch.Tensor:
+    """Resize image tensor to target size.
+    
+    Accepts CHW, BCHW or BHWC input and returns a batch in the input's
+    layout. ``antialias`` low-pass filters bilinear and bicubic
+    downsampling; ``"area"`` averages the covered source pixels. ``fit``
+    handles a change of aspect ratio: ``"stretch"`` scales each axis
+    independently, ``"cover"`` center-crops the input to the target aspect
+    ratio first and ``"contain"`` fits the whole input inside the target
+    and pads the rest with zeros. The batch is resized in chunks whose
+    float32 temporaries fit in ``memory_budget_mb``, written into one
+    preallocated output. With ``cache``, results are kept per input tensor
+    (by identity and version), so resizing the same input again is free.
+    """
+    if fit not in FIT_MODES:
+        raise ValueError(f"Unknown fit '{fit}', expected one of {FIT_MODES}")
+    target_size = (int(target_size[0]), int(target_size[1]))
+    
+    # Keyed by the caller's tensor, which outlives the unsqueezed view
+    params = (target_size, mode, antialias, fit)
+    if cache:
+        cached = _resize_cache.get(image, params)
+        if cached is not None:
+            return cached
+    
+    key_image = image
     if len(image.shape) == 3:
         image = image.unsqueeze(0)
     
-    resized = F.interpolate(image, size=target_size, mode=mode, align_corners=False)
+    channels_last = detect_layout(image) == "BHWC"
+    source = to_bchw(image)
+    batch, channels, height, width = source.shape
+    if (height, width) == target_size:
+        return image
+    
+    target_height, target_width = target_size
+    inner_height, inner_width, top, left = target_height, target_width, 0, 0
+    if fit == "cover":
+        if width * target_height > height * target_width:
+            crop = max(1, round(height * target_width / target_height))
+            source = source[..., (width - crop) // 2:(width - crop) // 2 + crop]
+        else:
+            crop = max(1, round(width * target_height / target_width))
+            source = source[..., (height - crop) // 2:(height - crop) // 2 + crop, :]
+        height, width = source.shape[-2:]
+    elif fit == "contain":
+        scale = min(target_height / height, target_width / width)
+        inner_height, inner_width = max(1, round(height * scale)), max(1, round(width * scale))
+        top, left = (target_height - inner_height) // 2, (target_width - inner_width) // 2
+    
+    dtype = image.dtype if image.is_floating_point() else torch.float32
+    allocate = torch.zeros if (inner_height, inner_width) != target_size else torch.empty
+    if channels_last:
+        resized = allocate((batch, target_height, target_width, channels), dtype=dtype, device=image.device)
+    else:
+        resized = allocate((batch, channels, target_height, target_width), dtype=dtype, device=image.device)
+    output = to_bchw(resized)[..., top:top + inner_height, left:left + inner_width]
+    
+    options = {}
+    if mode in ('bilinear', 'bicubic'):
+        options = {"align_corners": False, "antialias": antialias}
+    bytes_per_image = channels * (height * width + inner_height * inner_width) * 4
+    chunk = max(1, int(memory_budget_mb * 1024 * 1024) // bytes_per_image)
+    for start in range(0, batch, chunk):
+        part = source[start:start + chunk].float()
+        output[start:start + chunk] = F.interpolate(part, size=(inner_height, inner_width),
+                                                    mode=mode, **options)
+    
+    if cache:
+        _resize_cache.put(key_image, params, resized)
     return resized
 
+def comparison_size(size_a: Tuple[int, int], size_b: Tuple[int, int],
+                    strategy: str = "smallest", max_resolution: int = 0) -> Tuple[int, int]:
+    """Pick the common ``(height, width)`` for comparing two images.
+    
+    ``"smallest"`` uses the size of the image with fewer pixels, so the
+    larger input is downsampled instead of the smaller one upsampled;
+    ``"match_a"`` and ``"match_b"`` use that image's size. A positive
+    ``max_resolution`` caps the longer side, preserving the aspect ratio.
+    ``match_sizes`` center-crops an input of another aspect ratio rather
+    than squashing it.
+    """
+    if strategy == "match_a":
+        height, width = size_a
+    elif strategy == "match_b":
+        height, width = size_b
+    elif strategy == "smallest":
+        height, width = min(size_a, size_b, key=lambda size: size[0] * size[1])
+    else:
+        raise ValueError(f"Unknown resize strategy '{strategy}', expected one of {RESIZE_STRATEGIES}")
+    
+    if max_resolution > 0 and max(height, width) > max_resolution:
+        scale = max_resolution / max(height, width)
+        height, width = max(1, round(height * scale)), max(1, round(width * scale))
+    return int(height), int(width)
+
+def match_sizes(image_a: torch.Tensor, image_b: torch.Tensor, strategy: str = "smallest",
+                max_resolution: int = 0) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Resize two image batches to a common comparison size (see ``comparison_size``).
+    
+    Inputs whose aspect ratio differs from the common size are
+    center-cropped to it, so both sides show the same undistorted content,
+    and downsampling is antialiased. Results are cached by input, so
+    re-comparing the same reference against new candidates resizes the
+    reference only once.
+    """
+    size_a = to_bchw(image_a).shape[-2:]
+    size_b = to_bchw(image_b).shape[-2:]
+    target_size = comparison_size(tuple(size_a), tuple(size_b), strategy, max_resolution)
+    return (resize_image(image_a, target_size, antialias=True, fit="cover", cache=True),
+            resize_image(image_b, target_size, antialias=True, fit="cover", cache=True))
+
 def normalize_image(image: torch.Tensor, mean: Optional[Tuple[float, ...]] = None,
                    std: Optional[Tuple[float, ...]] = None) -> torch.Tensor:
     """Normalize image tensor."""
@@ -67,3 +286,108 @@ def remove_batch_dimension(image: torch.Tensor) -> torch.Tensor:
     if len(image.shape) == 4 and image.shape[0] == 1:
         return image.squeeze(0)
     return image
+
+def detect_layout(image: torch.Tensor) -> str:
+    """Detect whether a 4D image tensor is ``"BHWC"`` or ``"BCHW"``.
+
+    ComfyUI images are channels-last; a tensor is only treated as
+    channels-first when dim 1 looks like a channel axis and the last dim
+    does not.
+    """
+    if len(image.shape) != 4:
+        raise ValueError(f"Expected a 4D image tensor, got shape {tuple(image.shape)}")
+    if image.shape[1] in _CHANNEL_COUNTS and image.shape[-1] not in _CHANNEL_COUNTS:
+        return "BCHW"
+    return "BHWC"
+
+def to_bhwc(image: torch.Tensor) -> torch.Tensor:
+    """View an HW, CHW, HWC, BCHW or BHWC image tensor as BHWC without copying."""
+    if len(image.shape) == 2:
+        return image.unsqueeze(0).unsqueeze(-1)
+    if len(image.shape) == 3:
+        if image.shape[0] in _CHANNEL_COUNTS and image.shape[-1] not in _CHANNEL_COUNTS:
+            image = image.permute(1, 2, 0)
+        return image.unsqueeze(0)
+    if detect_layout(image) == "BCHW":
+        return image.permute(0, 2, 3, 1)
+    return image
+
+def to_bchw(image: torch.Tensor) -> torch.Tensor:
+    """View an image tensor of any supported layout as BCHW without copying."""
+    return to_bhwc(image).permute(0, 3, 1, 2)
+
+def quantize_uint8(image: torch.Tensor) -> torch.Tensor:
+    """Scale a [0, 1] image to a uint8 tensor on the same device.
+
+    Values are clamped and truncated like ``(x * 255).astype(np.uint8)``.
+    The float intermediate lives in a reused scratch buffer, so the only
+    allocation is the returned tensor.
+    """
+    scratch = _buffers.get("quantize", image.shape, torch.float32, image.device)
+    torch.mul(image, 255.0, out=scratch).clamp_(0.0, 255.0)
+    return scratch.to(torch.uint8)
+
+def tensor_to_numpy_uint8(image: torch.Tensor, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Convert a whole image batch to a BHWC uint8 numpy array.
+
+    Layout, dtype and device are handled in one place: the batch is scaled
+    into a reused float scratch buffer on its own device (through numpy
+    views on CPU), GPU results are staged through a reused pinned buffer,
+    and the final cast is written straight into ``out`` (allocated if not
+    given).
+
+    Args:
+        image: [0, 1] image tensor in any supported layout.
+        out: Optional preallocated BHWC uint8 array to write into.
+    """
+    image = to_bhwc(image)
+    if out is None:
+        out = np.empty(tuple(image.shape), dtype=np.uint8)
+    elif out.shape != tuple(image.shape) or out.dtype != np.uint8:
+        raise ValueError(f"Output buffer must be uint8 with shape {tuple(image.shape)}")
+
+    if not image.is_cuda:
+        scratch = _buffers.get("quantize", image.shape, torch.float32, "cpu").numpy()
+        np.multiply(image.detach().numpy(), 255.0, out=scratch, dtype=np.float32)
+        np.clip(scratch, 0.0, 255.0, out=scratch)
+        np.copyto(out, scratch, casting='unsafe')
+        return out
+
+    scratch = _buffers.get("quantize", image.shape, torch.float32, image.device)
+    torch.mul(image, 255.0, out=scratch).clamp_(0.0, 255.0)
+    staged = _buffers.get("stage_device", image.shape, torch.uint8, image.device)
+    staged.copy_(scratch)
+    pinned = _buffers.get("stage_host", image.shape, torch.uint8, "cpu", pin_memory=True)
+    pinned.copy_(staged)
+    torch.from_numpy(out).copy_(pinned)
+    return out
+
+def numpy_uint8_to_tensor(array: np.ndarray, layout: str = "BCHW",
+                          device: Optional[torch.device] = None) -> torch.Tensor:
+    """Convert a uint8 HW, HWC or BHWC array to a float [0, 1] image tensor.
+
+    CPU results take a single allocation; GPU results transfer the compact
+    uint8 data and convert on the device. The requested layout is returned
+    as a view.
+    """
+    if array.ndim == 2:
+        array = array[None, :, :, None]
+    elif array.ndim == 3:
+        array = array[None]
+
+    scale = array.dtype == np.uint8
+    if device is None or torch.device(device).type == "cpu":
+        tensor = torch.from_numpy(array.astype(np.float32))
+    else:
+        # Transfer the compact uint8 data and convert on the device
+        if not array.flags.writeable:
+            array = array.copy()
+        tensor = torch.from_numpy(array).to(device).to(torch.float32)
+    if scale:
+        tensor.div_(255.0)
+
+    if layout == "BCHW":
+        return tensor.permute(0, 3, 1, 2)
+    if layout == "BHWC":
+        return tensor
+    raise ValueError(f"Unknown layout '{layout}'")
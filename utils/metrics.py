@@ -0,0 +1,311 @@
+"""
+Batched image quality metrics.
+
+All metrics compare image pairs element-wise along the batch and return
+one score per pair (a ``[B]`` tensor) on the input device. Inputs may be
+BCHW or BHWC; a batch of one is broadcast against the other batch.
+"""
+
+import torch
+import torch.nn.functional as F
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+from .image_utils import to_bchw
+
+# Standard SSIM constants (Wang et al. 2004)
+SSIM_K1 = 0.01
+SSIM_K2 = 0.03
+
+# Per-scale weights of MS-SSIM (Wang et al. 2003)
+MS_SSIM_WEIGHTS = (0.0448, 0.2856, 0.3001, 0.2363, 0.1333)
+
+# PSNR of identical images is capped instead of infinite
+MAX_PSNR = 100.0
+
+METRICS = ("ssim", "ms_ssim", "psnr")
+
+# Pixels per image scored together on CPU; larger CPU batches only push the
+# filter temporaries out of cache (see ``benchmark_metrics``)
+CPU_CHUNK_PIXELS = 512 * 512
+
+@lru_cache(maxsize=16)
+def _gaussian_1d(size: int, sigma: float) -> torch.Tensor:
+    coords = torch.arange(size, dtype=torch.float64) - (size - 1) / 2
+    kernel = torch.exp(-(coords ** 2) / (2 * sigma ** 2))
+    return (kernel / kernel.sum()).float()
+
+def gaussian_filter(x: torch.Tensor, window_size: int = 11, sigma: float = 1.5) -> torch.Tensor:
+    """Separable Gaussian blur of every channel of a BCHW tensor ('valid' padding)."""
+    batch, channels, height, width = x.shape
+    kernel = _gaussian_1d(window_size, sigma).to(device=x.device, dtype=x.dtype)
+    # Depthwise convolution is much faster over one wide image than a batch
+    planes = batch * channels
+    x = x.reshape(1, planes, height, width)
+    x = F.conv2d(x, kernel.view(1, 1, 1, -1).expand(planes, 1, 1, -1), groups=planes)
+    x = F.conv2d(x, kernel.view(1, 1, -1, 1).expand(planes, 1, -1, 1), groups=planes)
+    return x.view(batch, channels, *x.shape[-2:])
+
+def prepare_pair(img_a: torch.Tensor, img_b: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Bring an image pair to matching float32 BCHW batches on the same device."""
+    a = to_bchw(img_a).float()
+    b = to_bchw(img_b).to(device=a.device, dtype=torch.float32)
+    if a.shape[1:] != b.shape[1:]:
+        raise ValueError(f"Image shapes differ: {tuple(a.shape)} vs {tuple(b.shape)}")
+    if a.shape[0] != b.shape[0]:
+        if a.shape[0] == 1:
+            a = a.expand_as(b)
+        elif b.shape[0] == 1:
+            b = b.expand_as(a)
+        else:
+            raise ValueError(f"Batch sizes differ: {a.shape[0]} vs {b.shape[0]}")
+    return a, b
+
+def _ssim_components(a: torch.Tensor, b: torch.Tensor, data_range: float,
+                     window_size: int, sigma: float) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Per-pair mean SSIM and contrast-structure terms of BCHW float inputs."""
+    window_size = min(window_size, a.shape[-2], a.shape[-1])
+    c1 = (SSIM_K1 * data_range) ** 2
+    c2 = (SSIM_K2 * data_range) ** 2
+
+    # Filter all five moments with a single pair of grouped convolutions
+    batch, channels = a.shape[:2]
+    moments = torch.cat([a, b, a * a, b * b, a * b], dim=1)
+    filtered = gaussian_filter(moments, window_size, sigma)
+    filtered = filtered.view(batch, 5, channels, *filtered.shape[-2:])
+    mu_a, mu_b, e_aa, e_bb, e_ab = filtered.unbind(1)
+    mu_aa, mu_bb, mu_ab = mu_a * mu_a, mu_b * mu_b, mu_a * mu_b
+    sigma_a = e_aa - mu_aa
+    sigma_b = e_bb - mu_bb
+    sigma_ab = e_ab - mu_ab
+
+    cs_map = (2 * sigma_ab + c2) / (sigma_a + sigma_b + c2)
+    ssim_map = (2 * mu_ab + c1) / (mu_aa + mu_bb + c1) * cs_map
+    return ssim_map.mean(dim=(1, 2, 3)), cs_map.mean(dim=(1, 2, 3))
+
+def ssim(img_a: torch.Tensor, img_b: torch.Tensor, data_range: float = 1.0,
+         window_size: int = 11, sigma: float = 1.5) -> torch.Tensor:
+    """Windowed SSIM of each image pair, averaged over channels.
+
+    Returns:
+        ``[B]`` tensor of scores in [-1, 1].
+    """
+    a, b = prepare_pair(img_a, img_b)
+    return _ssim_components(a, b, data_range, window_size, sigma)[0]
+
+def _multiscale_ssim(a: torch.Tensor, b: torch.Tensor, data_range: float, window_size: int,
+                     sigma: float, weights: Sequence[float]) -> Tuple[torch.Tensor, torch.Tensor]:
+    """MS-SSIM and full-resolution SSIM of prepared BCHW pairs."""
+    min_side = min(a.shape[-2:])
+    levels = len(weights)
+    while levels > 1 and min_side // 2 ** (levels - 1) < window_size:
+        levels -= 1
+    weights = torch.tensor(weights[:levels], device=a.device, dtype=a.dtype)
+    weights = weights / weights.sum()
+
+    factors = []
+    full_ssim = None
+    for level in range(levels):
+        ssim_value, cs_value = _ssim_components(a, b, data_range, window_size, sigma)
+        if level == 0:
+            full_ssim = ssim_value
+        if level == levels - 1:
+            factors.append(ssim_value)
+        else:
+            factors.append(cs_value)
+            a = F.avg_pool2d(a, 2)
+            b = F.avg_pool2d(b, 2)
+
+    # Negative terms would give complex powers; they carry no similarity
+    values = torch.stack(factors, dim=1).clamp_min(0.0)
+    return torch.prod(values ** weights, dim=1), full_ssim
+
+def ms_ssim(img_a: torch.Tensor, img_b: torch.Tensor, data_range: float = 1.0,
+            window_size: int = 11, sigma: float = 1.5,
+            weights: Sequence[float] = MS_SSIM_WEIGHTS) -> torch.Tensor:
+    """Multi-scale SSIM of each image pair.
+
+    Scales that would shrink the image below the window are dropped and
+    the remaining weights renormalized, so small images are supported.
+
+    Returns:
+        ``[B]`` tensor of scores in [0, 1].
+    """
+    a, b = prepare_pair(img_a, img_b)
+    return _multiscale_ssim(a, b, data_range, window_size, sigma, weights)[0]
+
+def psnr_from_mse(mse: torch.Tensor, data_range: float = 1.0) -> torch.Tensor:
+    """PSNR in dB of precomputed per-pair mean squared errors, capped at ``MAX_PSNR``."""
+    value = 10.0 * torch.log10(data_range ** 2 / mse.clamp_min(1e-12))
+    return value.clamp_max(MAX_PSNR)
+
+def psnr(img_a: torch.Tensor, img_b: torch.Tensor, data_range: float = 1.0) -> torch.Tensor:
+    """Peak signal-to-noise ratio of each image pair in dB, capped at ``MAX_PSNR``."""
+    a, b = prepare_pair(img_a, img_b)
+    return psnr_from_mse(torch.mean((a - b) ** 2, dim=(1, 2, 3)), data_range)
+
+def compare_images(img_a: torch.Tensor, img_b: torch.Tensor,
+                   metrics: Sequence[str] = METRICS, data_range: float = 1.0) -> Dict[str, torch.Tensor]:
+    """Compute several metrics for every image pair.
+
+    Args:
+        img_a: Reference batch.
+        img_b: Batch to compare against the reference.
+        metrics: Any of ``"ssim"``, ``"ms_ssim"`` and ``"psnr"``.
+        data_range: Value range of the images.
+
+    Returns:
+        Dict of metric name to ``[B]`` tensor of per-pair scores.
+
+    On CPU, pairs are scored in chunks of at most ``CPU_CHUNK_PIXELS``
+    pixels per image; on other devices the whole batch is scored at once.
+    """
+    unknown = set(metrics) - set(METRICS)
+    if unknown:
+        raise ValueError(f"Unknown metrics {sorted(unknown)}, expected any of {list(METRICS)}")
+    a, b = prepare_pair(img_a, img_b)
+    step = len(a)
+    if a.device.type == "cpu":
+        step = max(1, CPU_CHUNK_PIXELS // (a.shape[-2] * a.shape[-1]))
+    if step < len(a):
+        chunks = [_compare_prepared(a[i:i + step], b[i:i + step], metrics, data_range)
+                  for i in range(0, len(a), step)]
+        return {name: torch.cat([chunk[name] for chunk in chunks]) for name in metrics}
+    return _compare_prepared(a, b, metrics, data_range)
+
+def _compare_prepared(a: torch.Tensor, b: torch.Tensor, metrics: Sequence[str],
+                      data_range: float) -> Dict[str, torch.Tensor]:
+    results = {}
+    with torch.no_grad():
+        if "ms_ssim" in metrics:
+            # The first MS-SSIM scale is the full-resolution SSIM
+            results["ms_ssim"], full_ssim = _multiscale_ssim(a, b, data_range, 11, 1.5, MS_SSIM_WEIGHTS)
+            if "ssim" in metrics:
+                results["ssim"] = full_ssim
+        elif "ssim" in metrics:
+            results["ssim"] = ssim(a, b, data_range=data_range)
+        if "psnr" in metrics:
+            results["psnr"] = psnr(a, b, data_range=data_range)
+    return {name: results[name] for name in metrics}
+
+def _local_statistics(x: torch.Tensor, window_size: int, sigma: float) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Local Gaussian means and variances of every image of a BCHW batch."""
+    channels = x.shape[1]
+    filtered = gaussian_filter(torch.cat([x, x * x], dim=1), window_size, sigma)
+    mu, second_moment = filtered[:, :channels], filtered[:, channels:]
+    return mu, second_moment - mu * mu
+
+def _prepare_matrix_inputs(img_a: torch.Tensor, img_b) -> Tuple[torch.Tensor, torch.Tensor, bool]:
+    a = to_bchw(img_a).float()
+    if img_b is None:
+        return a, a, True
+    b = to_bchw(img_b).to(device=a.device, dtype=torch.float32)
+    if a.shape[1:] != b.shape[1:]:
+        raise ValueError(f"Image shapes differ: {tuple(a.shape)} vs {tuple(b.shape)}")
+    return a, b, False
+
+def ssim_matrix(img_a: torch.Tensor, img_b: Optional[torch.Tensor] = None, data_range: float = 1.0,
+                window_size: int = 11, sigma: float = 1.5, memory_budget_mb: float = 256.0) -> torch.Tensor:
+    """Windowed SSIM of every image in ``img_a`` against every image in ``img_b``.
+
+    Local means and variances are computed once per image; each pair then
+    only costs the Gaussian-filtered cross product, computed for a whole
+    row of candidates at a time in chunks that fit ``memory_budget_mb``.
+    Without ``img_b`` the symmetric matrix of ``img_a`` against itself is
+    returned and only its upper triangle is computed.
+
+    Returns:
+        ``[M, N]`` tensor of scores on the input device.
+    """
+    a, b, symmetric = _prepare_matrix_inputs(img_a, img_b)
+    window_size = min(window_size, a.shape[-2], a.shape[-1])
+    c1 = (SSIM_K1 * data_range) ** 2
+    c2 = (SSIM_K2 * data_range) ** 2
+
+    with torch.no_grad():
+        mu_a, var_a = _local_statistics(a, window_size, sigma)
+        mu_b, var_b = (mu_a, var_a) if symmetric else _local_statistics(b, window_size, sigma)
+
+        count_a, count_b = a.shape[0], b.shape[0]
+        scores = torch.empty((count_a, count_b), dtype=torch.float32, device=a.device)
+        bytes_per_pair = 3 * a[0].numel() * 4
+        chunk = max(1, int(memory_budget_mb * 1024 * 1024) // bytes_per_pair)
+        for i in range(count_a):
+            for start in range(i if symmetric else 0, count_b, chunk):
+                end = min(start + chunk, count_b)
+                e_ab = gaussian_filter(a[i:i + 1] * b[start:end], window_size, sigma)
+                mu_ab = mu_a[i:i + 1] * mu_b[start:end]
+                numerator = (2 * mu_ab + c1) * (2 * (e_ab - mu_ab) + c2)
+                denominator = ((mu_a[i:i + 1] ** 2 + mu_b[start:end] ** 2 + c1)
+                               * (var_a[i:i + 1] + var_b[start:end] + c2))
+                scores[i, start:end] = (numerator / denominator).mean(dim=(1, 2, 3))
+
+        if symmetric:
+            upper = torch.triu(scores)
+            scores = upper + upper.T - torch.diag(torch.diagonal(scores))
+    return scores
+
+def psnr_matrix(img_a: torch.Tensor, img_b: Optional[torch.Tensor] = None,
+                data_range: float = 1.0) -> torch.Tensor:
+    """PSNR of every image in ``img_a`` against every image in ``img_b``.
+
+    Pairwise squared errors are expanded as ``|a|^2 + |b|^2 - 2 a.b`` so all
+    cross terms come from a single float64 matrix product.
+
+    Returns:
+        ``[M, N]`` tensor of scores in dB on the input device.
+    """
+    a, b, _ = _prepare_matrix_inputs(img_a, img_b)
+    with torch.no_grad():
+        flat_a = a.flatten(1).double()
+        flat_b = b.flatten(1).double()
+        squared_a = (flat_a * flat_a).sum(dim=1)
+        squared_b = (flat_b * flat_b).sum(dim=1)
+        squared_error = squared_a[:, None] + squared_b[None, :] - 2 * flat_a @ flat_b.T
+        mse = squared_error.clamp_min(0.0) / flat_a.shape[1]
+    return psnr_from_mse(mse, data_range).float()
+
+def benchmark_metrics(sizes: Sequence[int] = (512, 1024), pairs: int = 8, repeats: int = 3,
+                      device: str = "cpu") -> Dict[int, Dict[str, float]]:
+    """Measure SSIM, MS-SSIM and PSNR throughput in image pairs per second.
+
+    ``batched`` scores all pairs with one ``compare_images`` call (chunked
+    by ``CPU_CHUNK_PIXELS`` on CPU); ``per_pair`` calls it once per pair,
+    as scoring one pair at a time would. Inputs are random RGB images with
+    added noise.
+
+    Returns:
+        Dict keyed by image size of ``{"batched": pairs_per_s,
+        "per_pair": pairs_per_s}`` (best of ``repeats`` runs each).
+    """
+    import time
+    
+    generator = torch.Generator().manual_seed(0)
+    results = {}
+    for size in sizes:
+        img_a = torch.rand((pairs, size, size, 3), generator=generator)
+        img_b = (img_a + 0.05 * torch.randn(img_a.shape, generator=generator)).clamp(0.0, 1.0)
+        img_a, img_b = img_a.to(device), img_b.to(device)
+        
+        def best_rate(run) -> float:
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                run()
+                if img_a.is_cuda:
+                    torch.cuda.synchronize()
+                best = min(best, time.perf_counter() - start)
+            return pairs / best
+        
+        results[size] = {
+            "batched": best_rate(lambda: compare_images(img_a, img_b)),
+            "per_pair": best_rate(lambda: [compare_images(img_a[i:i + 1], img_b[i:i + 1])
+                                           for i in range(pairs)]),
+        }
+    return results
+
+if __name__ == "__main__":
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"Device: {device}")
+    for size, rates in benchmark_metrics(device=device).items():
+        print(f"{size}x{size}: batched {rates['batched']:.1f} pairs/s, "
+              f"per_pair {rates['per_pair']:.1f} pairs/s")
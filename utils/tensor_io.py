@@ -0,0 +1,105 @@
+"""
+Flat tensor files in the safetensors layout.
+
+A file is an 8-byte little-endian header length, a JSON header mapping
+each tensor name to its dtype, shape and byte range, and one contiguous
+buffer holding every tensor back to back. Files are written tensor by
+tensor without building the buffer in memory, and loaded as views of a
+memory map, so nothing is copied until a tensor is used.
+"""
+
+import json
+import mmap
+import os
+import struct
+import torch
+from typing import Dict, Optional, Tuple
+
+DTYPE_CODES = {
+    torch.float64: "F64", torch.float32: "F32", torch.float16: "F16", torch.bfloat16: "BF16",
+    torch.int64: "I64", torch.int32: "I32", torch.int16: "I16", torch.int8: "I8",
+    torch.uint8: "U8", torch.bool: "BOOL",
+}
+CODE_DTYPES = {code: dtype for dtype, code in DTYPE_CODES.items()}
+
+def _byte_view(tensor: torch.Tensor) -> memoryview:
+    flat = tensor.detach().cpu().contiguous().reshape(-1)
+    return memoryview(flat.view(torch.uint8).numpy())
+
+def save_tensors(path: str, tensors: Dict[str, torch.Tensor],
+                 metadata: Optional[Dict[str, str]] = None, fsync: bool = True) -> int:
+    """Write ``tensors`` to ``path`` atomically and return the file size.
+
+    Tensors are ordered by element size, largest first, so every tensor
+    starts at an offset aligned to its dtype.
+    """
+    names = sorted(tensors, key=lambda name: (-tensors[name].element_size(), name))
+    header: Dict[str, object] = {}
+    if metadata:
+        header["__metadata__"] = {str(key): str(value) for key, value in metadata.items()}
+    offset = 0
+    for name in names:
+        tensor = tensors[name]
+        if tensor.dtype not in DTYPE_CODES:
+            raise ValueError(f"Cannot save tensor '{name}' of dtype {tensor.dtype}")
+        nbytes = tensor.numel() * tensor.element_size()
+        header[name] = {"dtype": DTYPE_CODES[tensor.dtype], "shape": list(tensor.shape),
+                        "data_offsets": [offset, offset + nbytes]}
+        offset += nbytes
+
+    encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    # Pad the header so the buffer starts 8-byte aligned
+    encoded += b" " * (-len(encoded) % 8)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(struct.pack("<Q", len(encoded)))
+        f.write(encoded)
+        for name in names:
+            if tensors[name].numel():
+                f.write(_byte_view(tensors[name]))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return 8 + len(encoded) + offset
+
+def read_header(path: str) -> Tuple[Dict[str, dict], Dict[str, str], int]:
+    """Tensor entries, metadata and buffer offset of a tensor file."""
+    with open(path, "rb") as f:
+        prefix = f.read(8)
+        if len(prefix) < 8:
+            raise ValueError(f"'{path}' is not a tensor file")
+        (length,) = struct.unpack("<Q", prefix)
+        if length > os.fstat(f.fileno()).st_size - 8:
+            raise ValueError(f"'{path}' has a truncated header")
+        header = json.loads(f.read(length))
+    metadata = header.pop("__metadata__", {})
+    return header, metadata, 8 + length
+
+def load_tensors(path: str) -> Tuple[Dict[str, torch.Tensor], Dict[str, str]]:
+    """Load a tensor file as memory-mapped tensors plus its metadata.
+
+    The mapping is copy-on-write: tensors can be modified in place without
+    touching the file, and pages are only read when first accessed.
+    """
+    entries, metadata, data_start = read_header(path)
+    size = os.path.getsize(path)
+    expected = max((entry["data_offsets"][1] for entry in entries.values()), default=0)
+    if data_start + expected > size:
+        raise ValueError(f"'{path}' is truncated")
+
+    tensors = {}
+    if size == 0 or not entries:
+        return tensors, metadata
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    for name, entry in entries.items():
+        dtype = CODE_DTYPES[entry["dtype"]]
+        begin, end = entry["data_offsets"]
+        if end == begin:
+            tensors[name] = torch.empty(entry["shape"], dtype=dtype)
+            continue
+        raw = torch.frombuffer(mapped, dtype=torch.uint8, count=end - begin, offset=data_start + begin)
+        tensors[name] = raw.view(dtype).reshape(entry["shape"])
+    return tensors, metadata
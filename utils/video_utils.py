@@ -0,0 +1,161 @@
+"""
+Video encoding utilities.
+"""
+
+import os
+import queue
+import tempfile
+import threading
+import cv2
+import torch
+import numpy as np
+from typing import Iterable, Optional
+from .image_utils import to_bhwc, tensor_to_numpy_uint8
+
+# Supported FourCC codecs and their default container extension
+VIDEO_CODECS = {
+    "mp4v": ".mp4",
+    "avc1": ".mp4",
+    "XVID": ".avi",
+    "MJPG": ".avi",
+    "VP80": ".webm",
+    "VP90": ".webm",
+}
+
+_STOP = object()
+
+class StreamingVideoEncoder:
+    """Encode frames incrementally on a background writer thread.
+
+    Frames are pushed one at a time (or from any iterable) into a bounded
+    queue; a writer thread converts them to uint8 BGR with reused buffers
+    and hands them to ``cv2.VideoWriter``. Producers block once the queue is
+    full, so peak memory is bounded by the queue depth rather than the
+    clip length, and frame generation overlaps with encoding.
+
+    Pushed tensors may hold one frame or a batch, whose frames are written
+    in order, and must not be modified in place afterwards. A temporary
+    output file is removed again if encoding fails or no frame is written.
+
+    Example:
+        with StreamingVideoEncoder("clip.mp4", fps=60) as encoder:
+            for frame in frames:
+                encoder.push(frame)
+    """
+
+    def __init__(self, output_path: Optional[str] = None, fps: float = 30,
+                 codec: str = "mp4v", queue_size: int = 8):
+        if codec not in VIDEO_CODECS:
+            raise ValueError(f"Unsupported codec '{codec}', expected one of {list(VIDEO_CODECS)}")
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+
+        self._temporary = output_path is None
+        if output_path is None:
+            from ..config.paths import get_temp_path
+            fd, output_path = tempfile.mkstemp(suffix=VIDEO_CODECS[codec], dir=get_temp_path())
+            os.close(fd)
+
+        self.output_path = output_path
+        self.fps = fps
+        self.codec = codec
+        self.frames_written = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="sidekick-video-encoder", daemon=True)
+        self._thread.start()
+
+    def push(self, frame: torch.Tensor) -> None:
+        """Queue a frame or IMAGE batch for encoding, blocking while the queue is full."""
+        if self._closed:
+            raise RuntimeError("Encoder is already closed")
+        while True:
+            self._raise_if_failed()
+            try:
+                self._queue.put(frame, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def write_frames(self, frames: Iterable[torch.Tensor]) -> None:
+        """Queue every frame from an iterable, consuming it lazily."""
+        for frame in frames:
+            self.push(frame)
+
+    def close(self) -> str:
+        """Flush queued frames, finalize the file and return its path."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+        if self._error is not None or self.frames_written == 0:
+            self._discard()
+        self._raise_if_failed()
+        if self.frames_written == 0:
+            raise ValueError("No frames provided")
+        return self.output_path
+
+    def __enter__(self) -> "StreamingVideoEncoder":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        elif not self._closed:
+            # Stop the writer without masking the original exception
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._discard()
+
+    def _discard(self) -> None:
+        """Remove an unfinished temporary output file."""
+        if self._temporary and os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Video encoding failed: {self._error}") from self._error
+
+    def _run(self) -> None:
+        writer = None
+        frame_rgb = frame_bgr = None
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is _STOP:
+                    break
+
+                batch = to_bhwc(frame)
+                if batch.shape[-1] == 1:
+                    batch = batch.expand(-1, -1, -1, 3)
+                elif batch.shape[-1] == 4:
+                    batch = batch[..., :3]
+                height, width = batch.shape[1:3]
+                if writer is None:
+                    fourcc = cv2.VideoWriter_fourcc(*self.codec)
+                    writer = cv2.VideoWriter(self.output_path, fourcc, self.fps, (width, height))
+                    if not writer.isOpened():
+                        raise RuntimeError(f"Could not open '{self.output_path}' with codec '{self.codec}'")
+                    frame_rgb = np.empty((1, height, width, 3), dtype=np.uint8)
+                    frame_bgr = np.empty((height, width, 3), dtype=np.uint8)
+                elif (height, width) != frame_bgr.shape[:2]:
+                    raise ValueError(f"Frame size {width}x{height} does not match "
+                                     f"{frame_bgr.shape[1]}x{frame_bgr.shape[0]}")
+
+                # A pushed IMAGE batch is written frame by frame
+                for index in range(batch.shape[0]):
+                    tensor_to_numpy_uint8(batch[index:index + 1], out=frame_rgb)
+                    cv2.cvtColor(frame_rgb[0], cv2.COLOR_RGB2BGR, dst=frame_bgr)
+                    writer.write(frame_bgr)
+                    self.frames_written += 1
+        except Exception as e:
+            self._error = e
+            # Keep draining until the producer signals the end
+            while self._queue.get() is not _STOP:
+                pass
+        finally:
+            if writer is not None:
+                writer.release()